@@ -1,10 +1,33 @@
+import base64
 import json
 import logging
-from odoo import http
+import uuid
+from datetime import datetime
+from odoo import fields, http
 from odoo.http import request, Response
+from odoo.tools import SQL
+from odoo.addons.queue_job.delay import group
 
 _logger = logging.getLogger(__name__)
 
+# invoice keys returned by GET /api/invoices and the account.move fields they read
+INVOICE_FIELDS = {
+    'id': [],
+    'name': ['name'],
+    'partner_id': ['partner_id'],
+    'partner_name': ['partner_id'],
+    'amount_total': ['amount_total'],
+    'state': ['state'],
+    'payments': [],
+}
+# items per job for POST /api/invoices?async=1
+INVOICE_ASYNC_CHUNK_SIZE = 100
+# keyset orders of GET /api/invoices, the last field must be unique
+INVOICE_ORDERS = {
+    'id': ['id'],
+    'write_date': ['write_date', 'id'],
+}
+
 # Ensure controller is registered at module load time
 class InvoiceController(http.Controller):
 
@@ -32,38 +55,186 @@ class InvoiceController(http.Controller):
     # Get List Invoices
     @http.route('/api/invoices', type='http', auth='api_key', methods=['GET'], csrf=False)
     def list_invoices(self, **params):
+        """List invoices, one page at a time.
+
+        Pages are keyset based: pass the ``next_cursor`` of a response as
+        ``cursor`` to get the next page. ``order`` is ``id`` (default with a
+        cursor) or ``write_date``, ``fields`` is a comma separated subset of
+        the keys of each invoice.
+
+        Without ``order`` nor ``cursor``, invoices are returned in the
+        default order of ``account.move`` as before, and ``next_cursor`` is
+        always null: pass ``order`` to page through the invoices.
+        """
+        keyset = bool(params.get('order') or params.get('cursor'))
+        order_key = params.get('order') or 'id'
+        if order_key not in INVOICE_ORDERS:
+            return Response(json.dumps({'error': 'order must be one of: %s' % ', '.join(INVOICE_ORDERS)}),
+                            status=400, content_type='application/json')
+        if params.get('fields'):
+            keys = [k.strip() for k in params['fields'].split(',') if k.strip()]
+            unknown = [k for k in keys if k not in INVOICE_FIELDS]
+            if unknown:
+                return Response(json.dumps({'error': 'Unknown fields: %s' % ', '.join(unknown)}),
+                                status=400, content_type='application/json')
+        else:
+            keys = list(INVOICE_FIELDS)
+        if not params.get('with_payments') and 'payments' in keys:
+            keys.remove('payments')
+        try:
+            limit = int(params.get('limit', 50))
+            cursor = self._decode_cursor(params['cursor'], order_key) if params.get('cursor') else None
+        except ValueError:
+            return Response(json.dumps({'error': 'Invalid limit or cursor'}), status=400,
+                            content_type='application/json')
+
         domain = []
         if params.get('partner_id'):
             domain.append(('partner_id', '=', int(params['partner_id'])))
         if params.get('state'):
             domain.append(('state', '=', params['state']))
-        moves = request.env['account.move'].search(domain, limit=int(params.get('limit', 50)))
+        if cursor:
+            domain += self._cursor_domain(cursor, order_key)
+
+        field_names = {fname for key in keys for fname in INVOICE_FIELDS[key]}
+        field_names.update(INVOICE_ORDERS[order_key])
+        field_names.discard('id')
+        # one query for the requested columns only
+        order = ', '.join(INVOICE_ORDERS[order_key]) if keyset else None
+        moves = request.env['account.move'].search_fetch(domain, list(field_names), limit=limit, order=order)
+        payments_by_move = self._get_reconciled_payments_by_move(moves) if 'payments' in keys else {}
         data = []
         for m in moves:
-            payments = [{
-                'payment_id': p.id,
-                'amount': p.amount,
-                'journal_id': p.journal_id.id,
-                'date': p.date,
-            } for p in m._get_reconciled_payments()] if params.get('with_payments') else []
-            data.append({
-                'id': m.id,
-                'name': m.name,
-                'partner_id': m.partner_id.id,
-                'partner_name': m.partner_id.name,
-                'amount_total': m.amount_total,
-                'state': m.state,
-                'payments': payments,
-            })
+            row = {}
+            for key in keys:
+                if key == 'id':
+                    row['id'] = m.id
+                elif key == 'partner_id':
+                    row['partner_id'] = m.partner_id.id
+                elif key == 'partner_name':
+                    row['partner_name'] = m.partner_id.name
+                elif key == 'payments':
+                    row['payments'] = payments_by_move.get(m.id, [])
+                else:
+                    row[key] = m[key]
+            data.append(row)
+
+        next_cursor = None
+        if keyset and limit and len(moves) == limit:
+            next_cursor = self._encode_cursor(moves[-1], order_key)
         return Response(
             json.dumps({
                 'count': len(data), 
-                'data': data
+                'data': data,
+                'next_cursor': next_cursor,
             }),
             status=200,
             content_type='application/json'
         )
 
+    def _get_reconciled_payments_by_move(self, moves):
+        """Return the reconciled payments of ``moves`` as ``{move_id: [payment, ...]}``.
+
+        Same payments as ``account.move._get_reconciled_payments``, but read
+        through the partial reconciliations of the whole page at once, plus
+        the matched payments that have no journal entry to reconcile.
+        """
+        if not moves:
+            return {}
+        env = request.env
+        env['account.move.line'].flush_model(['move_id', 'account_id'])
+        env['account.partial.reconcile'].flush_model(['debit_move_id', 'credit_move_id'])
+        # one join per side of the partials, an OR in the join condition
+        # prevents the use of their indexes
+        env.cr.execute(SQL(
+            """
+            SELECT line.move_id, counterpart.move_id
+              FROM account_move_line line
+              JOIN account_account account ON account.id = line.account_id
+              JOIN account_partial_reconcile part ON part.debit_move_id = line.id
+              JOIN account_move_line counterpart ON counterpart.id = part.credit_move_id
+             WHERE line.move_id IN %(move_ids)s
+               AND account.account_type IN ('asset_receivable', 'liability_payable')
+            UNION ALL
+            SELECT line.move_id, counterpart.move_id
+              FROM account_move_line line
+              JOIN account_account account ON account.id = line.account_id
+              JOIN account_partial_reconcile part ON part.credit_move_id = line.id
+              JOIN account_move_line counterpart ON counterpart.id = part.debit_move_id
+             WHERE line.move_id IN %(move_ids)s
+               AND account.account_type IN ('asset_receivable', 'liability_payable')
+            """,
+            move_ids=tuple(moves.ids),
+        ))
+        invoice_ids_by_counterpart = {}
+        for move_id, counterpart_move_id in env.cr.fetchall():
+            invoice_ids = invoice_ids_by_counterpart.setdefault(counterpart_move_id, [])
+            # several partials may link the same moves
+            if move_id not in invoice_ids:
+                invoice_ids.append(move_id)
+
+        payments = env['account.payment']
+        if invoice_ids_by_counterpart:
+            payments = payments.search_fetch(
+                [('move_id', 'in', list(invoice_ids_by_counterpart))],
+                ['move_id', 'amount', 'journal_id', 'date'],
+            )
+        payment_ids_by_move = {}
+        for p in payments:
+            for move_id in invoice_ids_by_counterpart[p.move_id.id]:
+                payment_ids_by_move.setdefault(move_id, set()).add(p.id)
+        # payments without journal entry are only linked to their invoices
+        for m in moves:
+            for p in m.matched_payment_ids:
+                if not p.move_id:
+                    payment_ids_by_move.setdefault(m.id, set()).add(p.id)
+                    payments |= p
+
+        payments_by_id = {p.id: p for p in payments}
+        res = {}
+        for move_id, payment_ids in payment_ids_by_move.items():
+            res[move_id] = [{
+                'payment_id': p.id,
+                'amount': p.amount,
+                'journal_id': p.journal_id.id,
+                'date': fields.Date.to_string(p.date),
+            } for p in (payments_by_id[payment_id] for payment_id in sorted(payment_ids))]
+        return res
+
+    def _encode_cursor(self, move, order_key):
+        """Opaque cursor pointing after ``move`` in the ``order_key`` order."""
+        values = []
+        for fname in INVOICE_ORDERS[order_key]:
+            value = move[fname]
+            # keep the microseconds: the records written in a transaction
+            # share the same write_date
+            values.append(value.isoformat() if fname == 'write_date' else value)
+        return base64.urlsafe_b64encode(json.dumps([order_key] + values).encode()).decode()
+
+    def _decode_cursor(self, cursor, order_key):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except Exception as e:
+            raise ValueError('Invalid cursor') from e
+        if not isinstance(values, list) or values[:1] != [order_key] \
+                or len(values) != len(INVOICE_ORDERS[order_key]) + 1:
+            raise ValueError('Invalid cursor')
+        values = values[1:]
+        try:
+            if order_key == 'write_date':
+                values[0] = datetime.fromisoformat(values[0])
+            values[-1] = int(values[-1])
+        except (TypeError, ValueError) as e:
+            raise ValueError('Invalid cursor') from e
+        return values
+
+    def _cursor_domain(self, cursor, order_key):
+        if order_key == 'write_date':
+            write_date, move_id = cursor
+            return ['|', ('write_date', '>', write_date),
+                    '&', ('write_date', '=', write_date), ('id', '>', move_id)]
+        return [('id', '>', cursor[0])]
+
 
     # Create a new Invoice
     @http.route('/api/invoices', type='http', auth='api_key', methods=['POST'], csrf=False)
@@ -78,18 +249,17 @@ class InvoiceController(http.Controller):
             return Response(json.dumps({'error': 'items must be a non-empty list'}), status=400,
                             content_type='application/json')
 
+        if str(payload.get('async') or data.get('async') or '') in ('1', 'true', 'True'):
+            return self._create_invoices_async(items, payload.get('chunk_size') or data.get('chunk_size'))
+
         created_ids = []
         errors = []
 
-        for it in items:
-            try:
-                with request.env.cr.savepoint():
-                    move_vals = self._prepare_move_vals(it)
-                    move = request.env['account.move'].create(move_vals)
-                    created_ids.append(move.id)
-            except Exception as e:
-                _logger.exception('Create invoice failed: %s', e)
-                errors.append({'item': it, 'error': str(e)})
+        for res in request.env['account.move']._api_create_invoices(items):
+            if 'id' in res:
+                created_ids.append(res['id'])
+            else:
+                errors.append({'item': items[res['index']], 'error': res['error']})
 
         status_code = 201 if created_ids else 400
         result = {'count': len(created_ids), 'data': created_ids}
@@ -98,7 +268,78 @@ class InvoiceController(http.Controller):
 
         return Response(json.dumps(result), status=status_code, content_type='application/json')
 
+    def _create_invoices_async(self, items, chunk_size=None):
+        """Validate the items, then queue their creation in chunk jobs."""
+        errors = []
+        for index, it in enumerate(items):
+            try:
+                self._prepare_move_vals(it)
+            except Exception as e:
+                errors.append({'index': index, 'item': it, 'error': str(e)})
+        if errors:
+            return Response(json.dumps({'error': 'Invalid items', 'errors': errors}), status=400,
+                            content_type='application/json')
+
+        try:
+            chunk_size = int(chunk_size or INVOICE_ASYNC_CHUNK_SIZE)
+        except (TypeError, ValueError):
+            return Response(json.dumps({'error': 'Invalid chunk_size'}), status=400,
+                            content_type='application/json')
+        chunk_size = max(chunk_size, 1)
+        batch_uuid = str(uuid.uuid4())
+        Move = request.env['account.move']
+        delayables = [
+            Move.delayable()._job_create_invoices_from_items(
+                items[offset:offset + chunk_size], batch_uuid=batch_uuid, offset=offset,
+            )
+            for offset in range(0, len(items), chunk_size)
+        ]
+        group(*delayables).delay()
+
+        return Response(json.dumps({
+            'batch_id': batch_uuid,
+            'count': len(items),
+            'jobs': len(delayables),
+        }), status=202, content_type='application/json')
+
+    # Get progress of an async invoice batch
+    @http.route('/api/invoices/batches/<string:batch_id>', type='http', auth='api_key', methods=['GET'],
+                csrf=False)
+    def get_invoice_batch(self, batch_id, **params):
+        jobs = request.env['queue.job'].sudo().search(
+            [('invoice_batch_uuid', '=', batch_id), ('user_id', '=', request.env.uid)],
+            order='id',
+        )
+        if not jobs:
+            return Response(json.dumps({'error': 'Batch not found'}), status=404, content_type='application/json')
+
+        states = {}
+        results = []
+        job_errors = []
+        for job in jobs:
+            states[job.state] = states.get(job.state, 0) + 1
+            if job.state == 'done' and job.result:
+                try:
+                    results += json.loads(job.result).get('results', [])
+                except ValueError:
+                    _logger.warning('Unreadable result for invoice batch job %s', job.uuid)
+            elif job.state in ('failed', 'cancelled'):
+                job_errors.append({'job_uuid': job.uuid, 'state': job.state,
+                                   'error': job.exc_message or job.result or ''})
 
+        finished = states.get('done', 0) + states.get('failed', 0) + states.get('cancelled', 0)
+        results.sort(key=lambda r: r['index'])
+        return Response(json.dumps({
+            'batch_id': batch_id,
+            'jobs': len(jobs),
+            'states': states,
+            'progress': round(finished / len(jobs), 4),
+            'done': finished == len(jobs),
+            'created': len([r for r in results if 'id' in r]),
+            'failed': len([r for r in results if 'error' in r]),
+            'results': results,
+            'job_errors': job_errors,
+        }), status=200, content_type='application/json')
 
     # Update Invoices
     @http.route('/api/invoices/<int:move_id>', type='http', auth='api_key', methods=['PUT'], csrf=False)
@@ -191,30 +432,4 @@ class InvoiceController(http.Controller):
 
 
     def _prepare_move_vals(self, item):
-        partner_id = item.get('partner_id')
-        lines = item.get('lines') or []
-        if not partner_id or not lines:
-            raise ValueError(_('partner_id and lines are required'))
-
-        aml = []
-        for l in lines:
-            line_vals = {
-                'name': l.get('name') or '/',
-                'quantity': l.get('quantity', 1.0),
-                'price_unit': l['price_unit'],
-            }
-            # kalau ada product_id, Odoo otomatis pilih akun
-            if l.get('product_id'):
-                line_vals['product_id'] = l['product_id']
-            # optional: tax_ids kalau memang dikirim
-            if l.get('tax_ids'):
-                line_vals['tax_ids'] = [(6, 0, l['tax_ids'])]
-
-            aml.append((0, 0, line_vals))
-
-        return {
-            'move_type': item.get('move_type', 'out_invoice'),  # customer invoice default
-            'partner_id': partner_id,
-            'invoice_date': item.get('invoice_date'),
-            'invoice_line_ids': aml,
-        }
\ No newline at end of file
+        return request.env['account.move']._api_prepare_move_vals(item)
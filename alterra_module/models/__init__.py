@@ -1 +1,3 @@
-from . import hr_employee_import_job
\ No newline at end of file
+from . import account_move_import_job
+from . import hr_employee_import_job
+from . import queue_job
@@ -0,0 +1,99 @@
+# account_move_import_job.py
+# -*- coding: utf-8 -*-
+import json
+import logging
+
+from odoo import _, api, models
+
+_logger = logging.getLogger(__name__)
+
+
+class AccountMove(models.Model):
+    _inherit = "account.move"
+
+    @api.model
+    def _api_prepare_move_vals(self, item):
+        """Return the create values of an invoice item of POST /api/invoices."""
+        partner_id = item.get('partner_id')
+        lines = item.get('lines') or []
+        if not partner_id or not lines:
+            raise ValueError(_('partner_id and lines are required'))
+
+        aml = []
+        for l in lines:
+            line_vals = {
+                'name': l.get('name') or '/',
+                'quantity': l.get('quantity', 1.0),
+                'price_unit': l['price_unit'],
+            }
+            # kalau ada product_id, Odoo otomatis pilih akun
+            if l.get('product_id'):
+                line_vals['product_id'] = l['product_id']
+            # optional: tax_ids kalau memang dikirim
+            if l.get('tax_ids'):
+                line_vals['tax_ids'] = [(6, 0, l['tax_ids'])]
+
+            aml.append((0, 0, line_vals))
+
+        return {
+            'move_type': item.get('move_type', 'out_invoice'),  # customer invoice default
+            'partner_id': partner_id,
+            'invoice_date': item.get('invoice_date'),
+            'invoice_line_ids': aml,
+        }
+
+    @api.model
+    def _api_create_invoices(self, items, offset=0):
+        """
+        Buat invoice dari item POST /api/invoices dengan satu create(vals_list).
+        Kalau create batch gagal, ulangi per item dengan savepoint sendiri
+        supaya item yang error bisa dipisahkan.
+        Return list per item: {"index", "id"} atau {"index", "error"},
+        index = offset + posisi item.
+        """
+        results = []
+        to_create = []  # (result, vals)
+        for index, item in enumerate(items, start=offset):
+            res = {'index': index}
+            results.append(res)
+            try:
+                to_create.append((res, self._api_prepare_move_vals(item)))
+            except Exception as e:
+                res['error'] = str(e)
+        if not to_create:
+            return results
+
+        try:
+            with self.env.cr.savepoint():
+                moves = self.create([vals for __, vals in to_create])
+        except Exception as e:
+            _logger.info('Batch create of %s invoices failed, retrying one by one: %s', len(to_create), e)
+        else:
+            for (res, __), move in zip(to_create, moves):
+                res['id'] = move.id
+            return results
+
+        for res, vals in to_create:
+            try:
+                with self.env.cr.savepoint():
+                    res['id'] = self.create(vals).id
+            except Exception as e:
+                _logger.exception('Create invoice failed: %s', e)
+                res['error'] = str(e)
+        return results
+
+    @api.model
+    def _job_create_invoices_from_items(self, items, batch_uuid=None, offset=0):
+        """
+        Buat invoice dari satu chunk item POST /api/invoices?async=1.
+        Satu error tidak menggagalkan item lain di chunk ini
+        (lihat _api_create_invoices).
+        Hasil (JSON) per item: {"index", "id"} atau {"index", "error"},
+        index = posisi item di payload asli.
+        """
+        results = self._api_create_invoices(items or [], offset=offset)
+        return json.dumps({'batch_id': batch_uuid, 'results': results})
+
+    @api.model
+    def _job_store_values_for__job_create_invoices_from_items(self, job):
+        return {"invoice_batch_uuid": job.kwargs.get("batch_uuid")}
@@ -1,10 +1,18 @@
 # hr_employee_import_job.py
 # -*- coding: utf-8 -*-
+import io
 import logging
-from odoo import models
+import uuid
+
+from odoo import api, models
+from odoo.tools import SQL, split_every
+from odoo.addons.queue_job.job import WAIT_DEPENDENCIES
 
 _logger = logging.getLogger(__name__)
 
+# Kolom payload chunk job (format kolumnar, lihat _import_pack_rows)
+IMPORT_ROW_FIELDS = ["name", "work_email", "job_title", "work_phone"]
+
 class HrEmployee(models.Model):
     _inherit = "hr.employee"
 
@@ -14,29 +22,37 @@ class HrEmployee(models.Model):
         - Jika work_email sudah ada di DB: SKIP (jangan update).
         - Jika work_email duplikat dalam satu file/job: SKIP (hanya ambil yang pertama).
         - Jika work_email kosong: tetap create.
+        rows boleh list of dict atau payload kolumnar dari _import_pack_rows.
         Semua skip dicatat ke log supaya bisa dilihat di Queue Job.
         """
         self = self.sudo()
 
-        created = 0
         skipped_existing = 0
         skipped_infile = 0
 
         skipped_existing_list = []
         skipped_infile_list = []
 
-        seen_in_file = set()  # track email yang sudah dipakai di job ini
-
-        for r in rows or []:
+        parsed = []
+        for r in self._import_unpack_rows(rows):
             name = (r.get("name") or "").strip()
             if not name:
                 # nama kosong → lewat
                 continue
+            parsed.append((
+                name,
+                (r.get("work_email") or "").strip().lower(),
+                (r.get("job_title") or "").strip() or False,
+                (r.get("work_phone") or "").strip() or False,
+            ))
 
-            email = (r.get("work_email") or "").strip().lower()
-            job_title = (r.get("job_title") or "").strip() or False
-            work_phone = (r.get("work_phone") or "").strip() or False
+        # Satu query IN untuk semua email di chunk ini (bukan search per baris)
+        existing_emails = self._import_existing_emails({p[1] for p in parsed if p[1]})
 
+        seen_in_file = set()  # track email yang sudah dipakai di job ini
+        vals_list = []
+
+        for name, email, job_title, work_phone in parsed:
             # Jika email ada & sudah muncul sebelumnya di file → skip
             if email and email in seen_in_file:
                 skipped_infile += 1
@@ -44,29 +60,30 @@ class HrEmployee(models.Model):
                 continue
 
             # Jika email ada & sudah ada record di DB → skip (jangan update)
-            if email:
-                exists = self.search([("work_email", "=", email)], limit=1)
-                if exists:
-                    skipped_existing += 1
-                    skipped_existing_list.append(email)
-                    # jangan tambahkan ke seen_in_file supaya baris selanjutnya
-                    # dengan email sama tetap ditandai "existing", bukan "infile"
-                    continue
+            if email and email in existing_emails:
+                skipped_existing += 1
+                skipped_existing_list.append(email)
+                # jangan tambahkan ke seen_in_file supaya baris selanjutnya
+                # dengan email sama tetap ditandai "existing", bukan "infile"
+                continue
 
-            # Lolos semua: create
-            vals = {
+            # Lolos semua: siapkan untuk create
+            vals_list.append({
                 "name": name,
                 "work_email": email or False,
                 "job_title": job_title,
                 "work_phone": work_phone,
-            }
-            self.create(vals)
-            created += 1
+            })
 
             # tandai email ini sudah dipakai di file (kalau ada)
             if email:
                 seen_in_file.add(email)
 
+        # Satu create(vals_list) untuk semua baris yang lolos
+        if vals_list:
+            self.create(vals_list)
+        created = len(vals_list)
+
         # Ringkasan log (dipotong supaya log tidak kebanyakan)
         def _sample(lst, n=20):
             return ", ".join(sorted(set(lst))[:n])
@@ -93,6 +110,119 @@ class HrEmployee(models.Model):
         }
 
 
+    @api.model
+    def _import_pack_rows(self, rows):
+        """Pack normalized row dicts into the columnar chunk job payload.
+
+        ``{"fields": [...], "rows": [[...], ...]}`` stores the field names
+        once per chunk instead of once per row in the job arguments.
+        """
+        return {
+            "fields": list(IMPORT_ROW_FIELDS),
+            "rows": [[r.get(f) or "" for f in IMPORT_ROW_FIELDS] for r in rows],
+        }
+
+    @api.model
+    def _import_unpack_rows(self, rows):
+        """Iterate row dicts from a columnar payload or a plain list of dicts."""
+        if isinstance(rows, dict):
+            fields = rows.get("fields") or []
+            return (dict(zip(fields, values)) for values in rows.get("rows") or [])
+        return rows or []
+
+    def _import_existing_emails(self, emails):
+        """Return the subset of ``emails`` already used by an active employee.
+
+        Comparison is case-insensitive: ``emails`` are expected lower-cased,
+        like the import job normalizes them.
+        """
+        if not emails:
+            return set()
+        self.flush_model(["work_email", "active"])
+        existing = set()
+        for sub_emails in split_every(self.env.cr.IN_MAX, emails):
+            self.env.cr.execute(
+                SQL(
+                    "SELECT DISTINCT lower(work_email) FROM hr_employee "
+                    "WHERE active AND lower(work_email) IN %s",
+                    tuple(sub_emails),
+                )
+            )
+            existing.update(email for (email,) in self.env.cr.fetchall())
+        return existing
+
+    def _job_split_import_file(self, attachment_id, file_name, has_header=True,
+                               chunk_size=500, notify_done=True):
+        """
+        Pecah file import (disimpan sebagai attachment) menjadi chunk job.
+        Baris dibaca satu per satu dan setiap chunk langsung di-enqueue,
+        jadi memori yang dipakai sebatas chunk_size, bukan ukuran file.
+        """
+        attachment = self.env["ir.attachment"].sudo().browse(attachment_id).exists()
+        if not attachment:
+            _logger.warning("HR Import split: attachment %s not found", attachment_id)
+            return {"chunks": 0}
+
+        wizard = self.env["hr.employee.import.wizard"].new({
+            "file_name": file_name,
+            "has_header": has_header,
+        })
+        chunk_uuids = []
+        buf = []
+        with self._import_open_attachment(attachment) as content:
+            for vals in wizard._iter_normalized_rows(content):
+                if not vals["name"]:
+                    continue
+                buf.append(vals)
+                if len(buf) >= (chunk_size or 500):
+                    chunk_uuids.append(self._import_delay_chunk(buf))
+                    buf = []
+        if buf:
+            chunk_uuids.append(self._import_delay_chunk(buf))
+
+        if notify_done and chunk_uuids:
+            self._import_delay_notify_after(chunk_uuids)
+
+        attachment.unlink()
+        _logger.info("HR Import split DONE: file=%s, chunks=%s", file_name, len(chunk_uuids))
+        return {"chunks": len(chunk_uuids)}
+
+    def _import_open_attachment(self, attachment):
+        """Open the content of ``attachment`` as a binary file.
+
+        Attachments of the filestore are read from their file as the rows
+        are consumed, only the ones stored in the database are loaded.
+        """
+        if attachment.store_fname:
+            return open(attachment._full_path(attachment.store_fname), "rb")
+        return io.BytesIO(attachment.raw or b"")
+
+    def _import_delay_chunk(self, rows):
+        """Enqueue one chunk job and return its uuid."""
+        job = self.with_delay()._job_create_employees_from_rows(self._import_pack_rows(rows))
+        # buang args yang sudah disimpan dari cache supaya memori tetap kecil
+        self.env["queue.job"].invalidate_model()
+        return job.uuid
+
+    def _import_delay_notify_after(self, chunk_uuids):
+        """Enqueue the notification job, waiting for all the given chunk jobs.
+
+        The chunk jobs are created one by one while the file is read, so the
+        graph (same as ``chain(group(...), notify)``) is linked afterwards.
+        """
+        notify_job = self.with_delay()._job_notify_import_done()
+        graph_uuid = str(uuid.uuid4())
+        QueueJob = self.env["queue.job"].sudo()
+        QueueJob.search([("uuid", "in", chunk_uuids)]).write({
+            "graph_uuid": graph_uuid,
+            "dependencies": {"depends_on": [], "reverse_depends_on": [notify_job.uuid]},
+        })
+        QueueJob.search([("uuid", "=", notify_job.uuid)]).write({
+            "graph_uuid": graph_uuid,
+            "state": WAIT_DEPENDENCIES,
+            "dependencies": {"depends_on": chunk_uuids, "reverse_depends_on": []},
+        })
+
     def _job_notify_import_done(self):
         """Send an email notification that the import has finished."""
         self = self.sudo()
@@ -0,0 +1,13 @@
+# queue_job.py
+# -*- coding: utf-8 -*-
+from odoo import fields, models
+
+
+class QueueJob(models.Model):
+    _inherit = "queue.job"
+
+    invoice_batch_uuid = fields.Char(
+        readonly=True,
+        index=True,
+        help="Batch of POST /api/invoices?async=1 the job belongs to.",
+    )
@@ -0,0 +1,4 @@
+from . import test_account_move_import_job
+from . import test_hr_employee_import_job
+from . import test_hr_employee_import_wizard
+from . import test_invoice_api
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+
+from odoo.tests.common import TransactionCase, tagged
+
+_logger = logging.getLogger(__name__)
+
+
+class AccountMoveImportCase(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Move = cls.env["account.move"]
+        cls.partner = cls.env["res.partner"].create({"name": "Bulk invoice partner"})
+
+    def _items(self, count):
+        return [
+            {"partner_id": self.partner.id, "lines": [{"name": "line %s" % i, "price_unit": 10}]}
+            for i in range(count)
+        ]
+
+
+@tagged("post_install", "-at_install")
+class TestAccountMoveImportJob(AccountMoveImportCase):
+
+    def test_create_invoices_batch(self):
+        results = self.Move._api_create_invoices(self._items(3))
+        self.assertEqual([r["index"] for r in results], [0, 1, 2])
+        moves = self.Move.browse([r["id"] for r in results])
+        self.assertEqual(moves.partner_id, self.partner)
+        self.assertEqual(moves.mapped("move_type"), ["out_invoice"] * 3)
+
+    def test_create_invoices_isolates_errors(self):
+        items = self._items(3)
+        items.insert(1, {"partner_id": self.partner.id})  # no lines
+        items.insert(2, {"partner_id": self.partner.id, "lines": [{"name": "x", "price_unit": 1}],
+                         "move_type": "not_a_type"})
+        results = self.Move._api_create_invoices(items, offset=10)
+        self.assertEqual([r["index"] for r in results], [10, 11, 12, 13, 14])
+        self.assertEqual(["id" in r for r in results], [True, False, False, True, True])
+        self.assertTrue(all("error" in r for r in results[1:3]))
+
+
+@tagged("post_install", "-at_install", "-standard", "alterra_benchmark")
+class TestAccountMoveImportBenchmark(AccountMoveImportCase):
+    """Run with ``--test-tags alterra_benchmark``."""
+
+    def _create_one_by_one(self, items):
+        for item in items:
+            with self.env.cr.savepoint():
+                self.Move.create(self.Move._api_prepare_move_vals(item))
+
+    def test_benchmark_create_invoices(self):
+        for count in (1, 100, 1000):
+            items = self._items(count)
+            start = time.perf_counter()
+            self._create_one_by_one(items)
+            self.env.flush_all()
+            one_by_one = time.perf_counter() - start
+
+            start = time.perf_counter()
+            self.Move._api_create_invoices(items)
+            self.env.flush_all()
+            batch = time.perf_counter() - start
+            _logger.info(
+                "create %s invoices: one by one %.1f items/s, batch %.1f items/s",
+                count, count / one_by_one, count / batch,
+            )
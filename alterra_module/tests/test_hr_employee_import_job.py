@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import base64
+
+from odoo.tests.common import TransactionCase, tagged
+
+
+@tagged("post_install", "-at_install")
+class TestHrEmployeeImportJob(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Employee = cls.env["hr.employee"]
+        cls.Employee.create({"name": "Existing", "work_email": "Existing@Example.com"})
+
+    def test_pack_rows(self):
+        rows = [
+            {"name": "A", "work_email": "a@example.com", "job_title": "", "work_phone": "1"},
+            {"name": "B", "work_email": "", "job_title": "Dev", "work_phone": ""},
+        ]
+        payload = self.Employee._import_pack_rows(rows)
+        self.assertEqual(payload["fields"], ["name", "work_email", "job_title", "work_phone"])
+        self.assertEqual(payload["rows"], [["A", "a@example.com", "", "1"], ["B", "", "Dev", ""]])
+        self.assertEqual(list(self.Employee._import_unpack_rows(payload)), rows)
+        self.assertEqual(list(self.Employee._import_unpack_rows(rows)), rows)
+
+    def test_create_employees_from_packed_rows(self):
+        rows = [
+            {"name": "New 1", "work_email": "NEW@example.com"},
+            {"name": "New 2", "work_email": "new@example.com"},
+            {"name": "Existing again", "work_email": "existing@example.com"},
+            {"name": "No email"},
+            {"name": ""},
+        ]
+        res = self.Employee._job_create_employees_from_rows(self.Employee._import_pack_rows(rows))
+        self.assertEqual(res, {"created": 2, "skipped_existing": 1, "skipped_infile": 1})
+        created = self.Employee.search([("name", "in", ["New 1", "No email"])])
+        self.assertEqual(len(created), 2)
+        self.assertEqual(
+            created.filtered(lambda e: e.name == "New 1").work_email, "new@example.com"
+        )
+
+    def test_split_import_file(self):
+        content = "name,email\n" + "".join(
+            "Split %s,split%s@example.com\n" % (i, i) for i in range(5)
+        )
+        attachment = self.env["ir.attachment"].create({
+            "name": "employees.csv",
+            "datas": base64.b64encode(content.encode()),
+        })
+        jobs_before = self.env["queue.job"].search([])
+        res = self.Employee._job_split_import_file(
+            attachment.id, "employees.csv", chunk_size=2, notify_done=True
+        )
+        self.assertEqual(res, {"chunks": 3})
+        self.assertFalse(attachment.exists())
+
+        jobs = self.env["queue.job"].search([]) - jobs_before
+        notify_job = jobs.filtered(lambda j: j.method_name == "_job_notify_import_done")
+        chunk_jobs = jobs - notify_job
+        self.assertEqual(len(notify_job), 1)
+        self.assertEqual(len(chunk_jobs), 3)
+        self.assertEqual(
+            sorted(len(j.args[0]["rows"]) for j in chunk_jobs), [1, 2, 2]
+        )
+        # the notification waits for every chunk job
+        self.assertEqual(notify_job.state, "wait_dependencies")
+        self.assertEqual(
+            sorted(notify_job.dependencies["depends_on"]), sorted(chunk_jobs.mapped("uuid"))
+        )
+        for chunk_job in chunk_jobs:
+            self.assertEqual(chunk_job.state, "pending")
+            self.assertEqual(chunk_job.dependencies["reverse_depends_on"], [notify_job.uuid])
+            self.assertEqual(chunk_job.graph_uuid, notify_job.graph_uuid)
+        self.assertTrue(notify_job.graph_uuid)
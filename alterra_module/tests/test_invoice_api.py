@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+import json
+
+from odoo.tests.common import HttpCase, tagged
+
+
+@tagged("post_install", "-at_install")
+class TestInvoiceApi(HttpCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.api_user = cls.env.ref("base.user_admin")
+        cls.api_key = cls.env["auth.api.key"].create({
+            "name": "invoice api test",
+            "user_id": cls.api_user.id,
+            "key": "invoice-api-test-key",
+        })
+        cls.headers = {"API-KEY": "invoice-api-test-key", "Content-Type": "application/json"}
+
+    def test_ping_requires_api_key(self):
+        response = self.url_open("/api/ping", headers={"API-KEY": "wrong"})
+        self.assertNotEqual(response.status_code, 200)
+        response = self.url_open("/api/ping", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "ok")
+
+    def test_list_invoices_keyset_pages(self):
+        partner = self.env["res.partner"].create({"name": "Invoice API partner"})
+        moves = self.env["account.move"].create([{
+            "move_type": "out_invoice",
+            "partner_id": partner.id,
+            "invoice_line_ids": [(0, 0, {"name": "line", "quantity": 1, "price_unit": 10 * i})],
+        } for i in range(1, 6)])
+
+        seen = []
+        cursor = None
+        for __ in range(5):
+            url = "/api/invoices?partner_id=%s&limit=2&order=id&fields=id,partner_name" % partner.id
+            if cursor:
+                url += "&cursor=%s" % cursor
+            payload = self.url_open(url, headers=self.headers).json()
+            for row in payload["data"]:
+                self.assertEqual(set(row), {"id", "partner_name"})
+                self.assertEqual(row["partner_name"], "Invoice API partner")
+            seen += [row["id"] for row in payload["data"]]
+            cursor = payload["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(seen, moves.sorted("id").ids)
+
+        response = self.url_open("/api/invoices?fields=id,foo", headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+        response = self.url_open("/api/invoices?cursor=garbage", headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_list_invoices_write_date_pages(self):
+        partner = self.env["res.partner"].create({"name": "Invoice API write_date partner"})
+        # created in one transaction, the invoices share the same write_date
+        moves = self.env["account.move"].create([{
+            "move_type": "out_invoice",
+            "partner_id": partner.id,
+        } for __ in range(5)])
+        self.assertEqual(len(set(moves.mapped("write_date"))), 1)
+
+        seen = []
+        cursor = None
+        for __ in range(5):
+            url = "/api/invoices?partner_id=%s&limit=2&order=write_date&fields=id" % partner.id
+            if cursor:
+                url += "&cursor=%s" % cursor
+            payload = self.url_open(url, headers=self.headers).json()
+            seen += [row["id"] for row in payload["data"]]
+            cursor = payload["next_cursor"]
+            if not cursor:
+                break
+        self.assertFalse(cursor, "the pages must end")
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(sorted(seen), moves.ids)
+
+    def test_list_invoices_default_order(self):
+        partner = self.env["res.partner"].create({"name": "Invoice API default order partner"})
+        moves = self.env["account.move"].create([{
+            "move_type": "out_invoice",
+            "partner_id": partner.id,
+        } for __ in range(3)])
+        url = "/api/invoices?partner_id=%s&limit=3&fields=id" % partner.id
+        payload = self.url_open(url, headers=self.headers).json()
+        # without order nor cursor, the order of account.move is kept
+        self.assertEqual([row["id"] for row in payload["data"]], moves.sorted().ids)
+        self.assertIsNone(payload["next_cursor"])
+
+    def test_list_invoices_with_payments(self):
+        partner = self.env["res.partner"].create({"name": "Invoice API payments partner"})
+        paid, unpaid = self.env["account.move"].create([{
+            "move_type": "out_invoice",
+            "partner_id": partner.id,
+            "invoice_line_ids": [(0, 0, {"name": "line", "quantity": 1, "price_unit": 100})],
+        } for __ in range(2)])
+        (paid | unpaid).action_post()
+        # partly paid, twice
+        for amount in (30, 20):
+            self.env["account.payment.register"].with_context(
+                active_model="account.move", active_ids=paid.ids
+            ).create({"amount": amount})._create_payments()
+        self.assertEqual(paid.payment_state, "partial")
+
+        url = "/api/invoices?partner_id=%s&fields=id,payments&with_payments=1" % partner.id
+        payload = self.url_open(url, headers=self.headers).json()
+        payments = {row["id"]: row["payments"] for row in payload["data"]}
+        self.assertEqual(
+            sorted(p["payment_id"] for p in payments[paid.id]),
+            sorted(paid._get_reconciled_payments().ids),
+        )
+        self.assertEqual(sorted(p["amount"] for p in payments[paid.id]), [20, 30])
+        self.assertEqual(payments[unpaid.id], unpaid._get_reconciled_payments().ids)
+
+    def test_create_invoices_async(self):
+        partner = self.env["res.partner"].create({"name": "Async partner"})
+        items = [
+            {"partner_id": partner.id, "lines": [{"name": "line", "price_unit": 10}]}
+            for __ in range(5)
+        ]
+        response = self.url_open(
+            "/api/invoices?async=1&chunk_size=2",
+            data=json.dumps({"items": items}),
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, 202)
+        payload = response.json()
+        self.assertEqual(payload["jobs"], 3)
+        jobs = self.env["queue.job"].search(
+            [("invoice_batch_uuid", "=", payload["batch_id"])]
+        )
+        self.assertEqual(len(jobs), 3)
+
+        response = self.url_open(
+            "/api/invoices/batches/%s" % payload["batch_id"], headers=self.headers
+        )
+        batch = response.json()
+        self.assertEqual(batch["jobs"], 3)
+        self.assertFalse(batch["done"])
+
+        result = json.loads(
+            self.env["account.move"]._job_create_invoices_from_items(
+                items[:2] + [{"partner_id": partner.id}], offset=4
+            )
+        )
+        self.assertEqual([r["index"] for r in result["results"]], [4, 5, 6])
+        self.assertIn("error", result["results"][2])
+
+    def test_create_invoices_async_invalid(self):
+        response = self.url_open(
+            "/api/invoices?async=1",
+            data=json.dumps({"items": [{"partner_id": False}]}),
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["errors"][0]["index"], 0)
+
+    def test_create_invoices_async_invalid_chunk_size(self):
+        partner = self.env["res.partner"].create({"name": "Async chunk partner"})
+        for chunk_size in ("abc", [10], {"size": 10}):
+            response = self.url_open(
+                "/api/invoices?async=1",
+                data=json.dumps({
+                    "items": [{
+                        "partner_id": partner.id,
+                        "lines": [{"name": "line", "price_unit": 10}],
+                    }],
+                    "chunk_size": chunk_size,
+                }),
+                headers=self.headers,
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()["error"], "Invalid chunk_size")
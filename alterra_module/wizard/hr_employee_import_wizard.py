@@ -11,6 +11,14 @@ try:
 except Exception:
     openpyxl = None
 
+# Accepted header spellings per field, by order of preference
+HEADER_ALIASES = {
+    "name": ["name", "employee name", "employee", "nama"],
+    "work_email": ["work_email", "work email", "email", "email address", "e-mail"],
+    "job_title": ["job_title", "job title", "job position", "position", "title"],
+    "work_phone": ["work_phone", "work phone", "phone", "mobile", "no hp", "no telp", "telephone", "tel"],
+}
+
 
 class HrEmployeeImportWizard(models.TransientModel):
     _name = "hr.employee.import.wizard"
@@ -21,19 +29,33 @@ class HrEmployeeImportWizard(models.TransientModel):
     has_header = fields.Boolean(default=True)
     chunk_size = fields.Integer(default=500)
     notify_done = fields.Boolean(default=True, string="Notify by Email when done")
+    streaming = fields.Boolean(
+        string="Stream large file",
+        help="Store the file as an attachment and let a background job read it "
+        "and queue the chunk jobs, instead of reading all rows while queuing.",
+    )
 
     def _decode_file(self):
         if not self.file or not self.file_name:
             raise UserError(_("Please upload a file."))
         return base64.b64decode(self.file)
 
+    def _open_content(self, content):
+        """Return ``content`` as a binary file, it may be bytes or a file."""
+        if isinstance(content, bytes):
+            return io.BytesIO(content)
+        return content
+
     def _iter_rows_csv(self, content):
         """Yield dict rows using header names.
 
         This is more robust than positional mapping and allows
         arbitrary column order as long as headers are present.
+        The file is decoded while it is read, not loaded at once.
         """
-        f = io.StringIO(content.decode("utf-8", errors="replace"))
+        f = io.TextIOWrapper(
+            self._open_content(content), encoding="utf-8", errors="replace", newline=""
+        )
         # If file has a header, DictReader maps columns by header name.
         # If no header, fall back to simple reader and numeric keys.
         if self.has_header:
@@ -50,7 +72,7 @@ class HrEmployeeImportWizard(models.TransientModel):
         """Yield dict rows for .xlsx using header names when available."""
         if openpyxl is None:
             raise UserError(_("openpyxl is required to read .xlsx files. Install it or use CSV."))
-        wb = openpyxl.load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+        wb = openpyxl.load_workbook(self._open_content(content), read_only=True, data_only=True)
         ws = wb.active
 
         headers = None
@@ -66,32 +88,57 @@ class HrEmployeeImportWizard(models.TransientModel):
                 yield {headers[i] if i < len(headers) else str(i): v for i, v in enumerate(row_vals)}
 
     # --- helpers to normalize row mapping ---
-    def _normalize_row(self, rowdict):
-        """Return a dict with keys: name, work_email, job_title, work_phone.
+    def _compile_header_map(self, headers):
+        """Resolve once which header feeds each field.
 
-        Accepts multiple header spellings and is case-insensitive.
-        Extra columns are ignored.
+        Return a dict ``{field: header}`` for the fields with a matching
+        header. Accepts multiple header spellings and is case-insensitive;
+        the first spelling of ``HEADER_ALIASES`` found in the headers wins.
         """
-        def get_any(keys, default=""):
-            for k in keys:
-                for existing in rowdict.keys():
-                    if (existing or "").strip().lower() == k:
-                        val = rowdict.get(existing) or ""
-                        # Cast everything to string-ish and strip
-                        return str(val).strip()
-            return default
-
-        name = get_any(["name", "employee name", "employee", "nama"])
-        email = get_any(["work_email", "work email", "email", "email address", "e-mail"])
-        job_title = get_any(["job_title", "job title", "job position", "position", "title"])
-        work_phone = get_any(["work_phone", "work phone", "phone", "mobile", "no hp", "no telp", "telephone", "tel"])
+        by_alias = {}
+        for header in headers:
+            by_alias.setdefault((header or "").strip().lower(), header)
+        header_map = {}
+        for field, aliases in HEADER_ALIASES.items():
+            for alias in aliases:
+                if alias in by_alias:
+                    header_map[field] = by_alias[alias]
+                    break
+        return header_map
+
+    def _normalize_row(self, rowdict, header_map=None):
+        """Return a dict with keys: name, work_email, job_title, work_phone.
 
-        return {
-            "name": name,
-            "work_email": email,
-            "job_title": job_title,
-            "work_phone": work_phone,
-        }
+        ``header_map`` comes from :meth:`_compile_header_map`; it is computed
+        from the row itself when not given. Extra columns are ignored.
+        """
+        if header_map is None:
+            header_map = self._compile_header_map(rowdict)
+        res = {}
+        for field in HEADER_ALIASES:
+            header = header_map.get(field)
+            # Cast everything to string-ish and strip
+            res[field] = str(rowdict.get(header) or "").strip() if header is not None else ""
+        return res
+
+    def _iter_normalized_rows(self, content):
+        """Yield normalized rows of the file, mapping the headers once per file.
+
+        ``content`` is the file content, as bytes or as a binary file.
+        """
+        if self._detect_ext() == "csv":
+            row_iter = self._iter_rows_csv(content)
+        else:
+            row_iter = self._iter_rows_xlsx(content)
+        header_map = None
+        header_count = 0
+        for rowdict in row_iter:
+            rowdict = rowdict or {}
+            # rows with a different column count (short xlsx rows) get their own map
+            if header_map is None or len(rowdict) != header_count:
+                header_map = self._compile_header_map(rowdict)
+                header_count = len(rowdict)
+            yield self._normalize_row(rowdict, header_map)
 
     def _detect_ext(self):
         name = (self.file_name or "").lower()
@@ -103,14 +150,13 @@ class HrEmployeeImportWizard(models.TransientModel):
 
     def action_queue_import(self):
         self.ensure_one()
+        if self.streaming:
+            return self._action_queue_import_streaming()
         content = self._decode_file()
-        ext = self._detect_ext()
-        row_iter = self._iter_rows_csv(content) if ext == "csv" else self._iter_rows_xlsx(content)
 
         batches = []
         buf = []
-        for rowdict in row_iter:
-            vals = self._normalize_row(rowdict or {})
+        for vals in self._iter_normalized_rows(content):
             if vals["name"]:
                 buf.append(vals)
                 if len(buf) >= (self.chunk_size or 500):
@@ -127,12 +173,41 @@ class HrEmployeeImportWizard(models.TransientModel):
             import_total_chunks=len(batches),
         )
 
-        delayables = [Employee.delayable()._job_create_employees_from_rows(batch) for batch in batches]
+        delayables = [
+            Employee.delayable()._job_create_employees_from_rows(Employee._import_pack_rows(batch))
+            for batch in batches
+        ]
         job_graph = group(*delayables)
         if self.notify_done:
             job_graph = chain(job_graph, Employee.delayable()._job_notify_import_done())
         job_graph.delay()
 
+        return self._queued_notification(
+            _("Queued %s job(s). Track them in Technical → Queue Jobs.") % len(batches)
+        )
+
+    def _action_queue_import_streaming(self):
+        """Store the file once and queue a splitter job that creates the chunks."""
+        if not self.file or not self.file_name:
+            raise UserError(_("Please upload a file."))
+        self._detect_ext()
+        attachment = self.env["ir.attachment"].sudo().create({
+            "name": self.file_name,
+            "datas": self.file,
+        })
+        self.env["hr.employee"].with_delay()._job_split_import_file(
+            attachment.id,
+            self.file_name,
+            has_header=self.has_header,
+            chunk_size=self.chunk_size or 500,
+            notify_done=self.notify_done,
+        )
+        return self._queued_notification(
+            _("Queued the split of %s. Chunk jobs will appear in Technical → Queue Jobs.")
+            % self.file_name
+        )
+
+    def _queued_notification(self, message):
         action_queue_jobs = self.env.ref("queue_job.action_queue_job").read()[0]
 
         return {
@@ -140,7 +215,7 @@ class HrEmployeeImportWizard(models.TransientModel):
             "tag": "display_notification",
             "params": {
                 "title": _("Employee import queued"),
-                "message": _("Queued %s job(s). Track them in Technical → Queue Jobs.") % len(batches),
+                "message": message,
                 "sticky": False,
                 "next": action_queue_jobs,
             },
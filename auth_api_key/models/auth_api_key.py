@@ -1,9 +1,11 @@
 # Copyright 2018 ACSONE SA/NV
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
+import hashlib
+
 from odoo import _, api, fields, models, tools
 from odoo.exceptions import AccessError, ValidationError
-from odoo.tools import consteq
+from odoo.tools import SQL, consteq
 
 
 class AuthApiKey(models.Model):
@@ -16,6 +18,13 @@ class AuthApiKey(models.Model):
         help="""The API key. Enter a dummy value in this field if it is
         obtained from the server environment configuration.""",
     )
+    key_hash = fields.Char(
+        compute="_compute_key_hash",
+        store=True,
+        index=True,
+        copy=False,
+        help="SHA-256 digest of the key, used to look the key up.",
+    )
     user_id = fields.Many2one(
         comodel_name="res.users",
         string="User",
@@ -31,6 +40,23 @@ class AuthApiKey(models.Model):
 
     _sql_constraints = [("name_uniq", "unique(name)", "Api Key name must be unique.")]
 
+    # fields whose change must invalidate the cached key lookups
+    _key_cache_fields = {"key", "user_id", "active"}
+
+    @api.model
+    def _hash_key(self, key):
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    @api.model
+    def _mask_key(self, key):
+        # the key is a secret, only show enough of it to recognize it
+        return f"{key[:4]}***" if len(key) > 8 else "***"
+
+    @api.depends("key")
+    def _compute_key_hash(self):
+        for record in self:
+            record.key_hash = self._hash_key(record.key) if record.key else False
+
     @api.model
     def _retrieve_api_key(self, key):
         return self.browse(self._retrieve_api_key_id(key))
@@ -40,16 +66,37 @@ class AuthApiKey(models.Model):
     def _retrieve_api_key_id(self, key):
         if not self.env.user.has_group("base.group_system"):
             raise AccessError(_("User is not allowed"))
-        for api_key in self.search([]):
-            if api_key.key and consteq(key, api_key.key):
-                return api_key.id
-        raise ValidationError(_(f"The key {key} is not allowed"))
+        api_key = self.search([("key_hash", "=", self._hash_key(key))], limit=1)
+        if api_key.key and consteq(key, api_key.key):
+            return api_key.id
+        raise ValidationError(_("The key %s is not allowed", self._mask_key(key)))
 
     @api.model
     @tools.ormcache("key")
     def _retrieve_uid_from_api_key(self, key):
         return self._retrieve_api_key(key).user_id.id
 
+    @api.model
+    @tools.ormcache("key")
+    def _retrieve_api_key_auth_data(self, key):
+        """Return ``(api_key_id, user_id)`` of the active key matching ``key``.
+
+        Used to authenticate requests: it reads the table directly so it
+        needs neither a superuser environment nor access rights.
+        """
+        self.flush_model(["key", "key_hash", "user_id", "active"])
+        self.env.cr.execute(
+            SQL(
+                "SELECT id, key, user_id FROM auth_api_key "
+                "WHERE key_hash = %s AND active",
+                self._hash_key(key),
+            )
+        )
+        for api_key_id, api_key, user_id in self.env.cr.fetchall():
+            if api_key and consteq(key, api_key):
+                return api_key_id, user_id
+        raise ValidationError(_("The key %s is not allowed", self._mask_key(key)))
+
     def _clear_key_cache(self):
         self.env.registry.clear_cache()
 
@@ -67,12 +114,12 @@ class AuthApiKey(models.Model):
     @api.model_create_multi
     def create(self, vals_list):
         records = super().create(vals_list)
-        if any(["key" in vals or "user_id" in vals for vals in vals_list]):
+        if any(self._key_cache_fields.intersection(vals) for vals in vals_list):
             self._clear_key_cache()
         return records
 
     def write(self, vals):
         super().write(vals)
-        if "key" in vals or "user_id" in vals:
+        if self._key_cache_fields.intersection(vals):
             self._clear_key_cache()
         return True
@@ -6,7 +6,7 @@
 import logging
 
 from odoo import models
-from odoo.exceptions import AccessDenied
+from odoo.exceptions import AccessDenied, ValidationError
 from odoo.http import request
 
 _logger = logging.getLogger(__name__)
@@ -20,17 +20,16 @@ class IrHttp(models.AbstractModel):
         headers = request.httprequest.environ
         api_key = headers.get("HTTP_API_KEY")
         if api_key:
-            request.update_env(user=1)
-            auth_api_key = request.env["auth.api.key"]._retrieve_api_key(api_key)
-            if auth_api_key:
-                # reset _env on the request since we change the uid...
-                # the next call to env will instantiate an new
-                # odoo.api.Environment with the user defined on the
-                # auth.api_key
-                request._env = None
-                request.update_env(user=auth_api_key.user_id.id)
+            try:
+                api_key_id, user_id = request.env[
+                    "auth.api.key"
+                ]._retrieve_api_key_auth_data(api_key)
+            except ValidationError:
+                pass
+            else:
+                request.update_env(user=user_id)
                 request.auth_api_key = api_key
-                request.auth_api_key_id = auth_api_key.id
+                request.auth_api_key_id = api_key_id
                 return True
         _logger.error("Wrong HTTP_API_KEY, access denied")
         raise AccessDenied()
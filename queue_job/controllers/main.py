@@ -14,10 +14,11 @@ from werkzeug.exceptions import BadRequest, Forbidden
 from odoo import SUPERUSER_ID, _, api, http
 from odoo.modules.registry import Registry
 from odoo.service.model import PG_CONCURRENCY_ERRORS_TO_RETRY
+from odoo.tools import config
 
 from ..delay import chain, group
 from ..exception import FailedJobError, RetryableJobError
-from ..job import ENQUEUED, Job
+from ..job import ENQUEUED, PENDING, Job
 
 _logger = logging.getLogger(__name__)
 
@@ -25,6 +26,9 @@ PG_RETRY = 5  # seconds
 
 DEPENDS_MAX_TRIES_ON_CONCURRENCY_FAILURE = 5
 
+# part of limit_time_real after which /queue_job/runjobs starts no new job
+RUNJOBS_TIME_LIMIT_RATIO = 0.5
+
 
 class RunJobController(http.Controller):
     def _try_perform_job(self, env, job):
@@ -83,6 +87,14 @@ class RunJobController(http.Controller):
     def runjob(self, db, job_uuid, **kw):
         http.request.session.db = db
         env = http.request.env(user=SUPERUSER_ID)
+        return self._runjob(env, job_uuid)
+
+    def _runjob(self, env, job_uuid):
+        """Run an enqueued job
+
+        Used by the ``/queue_job/runjob`` route, and by the job executor
+        workers which run jobs without going through HTTP.
+        """
 
         def retry_postpone(job, message, seconds=None):
             job.env.clear()
@@ -151,6 +163,61 @@ class RunJobController(http.Controller):
 
         return ""
 
+    @http.route(
+        "/queue_job/runjobs",
+        type="http",
+        auth="none",
+        save_session=False,
+        readonly=False,
+    )
+    def runjobs(self, db, job_uuids, **kw):
+        """Run several enqueued jobs of a database, one after the other
+
+        Each job is run in its own transaction, like with
+        ``/queue_job/runjob``, which skips the jobs that are not enqueued
+        anymore. Once half of ``limit_time_real`` is elapsed, the jobs not
+        started yet are set back to pending instead of being run, so the
+        worker is not killed with jobs left enqueued.
+        """
+        http.request.session.db = db
+        env = http.request.env(user=SUPERUSER_ID)
+        job_uuids = job_uuids.split(",")
+        deadline = None
+        limit_time_real = config["limit_time_real"]
+        if limit_time_real and limit_time_real > 0:
+            deadline = time.monotonic() + limit_time_real * RUNJOBS_TIME_LIMIT_RATIO
+        for index, job_uuid in enumerate(job_uuids):
+            if deadline and time.monotonic() >= deadline:
+                self._requeue_jobs(env, job_uuids[index:])
+                break
+            try:
+                self._runjob(env, job_uuid)
+            except Exception:
+                # the failure has been logged and stored on the job,
+                # go on with the next jobs
+                env.cr.rollback()
+        return ""
+
+    def _requeue_jobs(self, env, job_uuids):
+        """Set enqueued jobs back to pending, for the runner to run them in
+        another request"""
+        env.cr.execute(
+            "UPDATE queue_job SET state=%s, date_enqueued=NULL, date_started=NULL "
+            "WHERE uuid IN (SELECT uuid FROM queue_job "
+            "WHERE uuid = ANY(%s) AND state=%s FOR UPDATE SKIP LOCKED) "
+            "RETURNING uuid",
+            (PENDING, job_uuids, ENQUEUED),
+        )
+        requeued_uuids = [uuid for (uuid,) in env.cr.fetchall()]
+        env.cr.commit()
+        env.invalidate_all()
+        if requeued_uuids:
+            _logger.info(
+                "time limit of the request almost reached, jobs %s set back to %s",
+                ", ".join(requeued_uuids),
+                PENDING,
+            )
+
     def _get_failure_values(self, job, traceback_txt, orig_exception):
         """Collect relevant data from exception."""
         exception_name = orig_exception.__class__.__name__
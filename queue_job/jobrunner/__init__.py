@@ -2,10 +2,16 @@
 # Copyright 2016 Camptocamp SA
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
 
+import errno
 import logging
+import os
+import select
+import socket
 from threading import Thread
 import time
 
+from odoo import SUPERUSER_ID, api
+from odoo.modules.registry import Registry
 from odoo.service import server
 from odoo.tools import config
 
@@ -20,13 +26,38 @@ except ImportError:
     queue_job_config = config.misc.get("queue_job", {})
 
 
-from .runner import QueueJobRunner, _channels
+from .runner import (
+    QueueJobRunner,
+    _channels,
+    _executor_socket_path,
+    _executor_workers,
+)
 
 _logger = logging.getLogger(__name__)
 
 START_DELAY = 5
 
 
+def _runner_class():
+    runner = (
+        os.environ.get("ODOO_QUEUE_JOB_RUNNER")
+        or queue_job_config.get("runner")
+        or "default"
+    )
+    if runner == "asyncio":
+        from .async_runner import AsyncQueueJobRunner, aiohttp
+
+        if aiohttp is not None:
+            return AsyncQueueJobRunner
+        _logger.error(
+            "the asyncio job runner requires the aiohttp library, "
+            "using the default job runner"
+        )
+    elif runner != "default":
+        _logger.error("unknown job runner %r, using the default one", runner)
+    return QueueJobRunner
+
+
 # Here we monkey patch the Odoo server to start the job runner thread
 # in the main server process (and not in forked workers). This is
 # very easy to deploy as we don't need another startup script.
@@ -36,7 +67,7 @@ class QueueJobRunnerThread(Thread):
     def __init__(self):
         Thread.__init__(self)
         self.daemon = True
-        self.runner = QueueJobRunner.from_environ_or_config()
+        self.runner = _runner_class().from_environ_or_config()
 
     def run(self):
         # sleep a bit to let the workers start at ease
@@ -53,7 +84,7 @@ class WorkerJobRunner(server.Worker):
     def __init__(self, multi):
         super().__init__(multi)
         self.watchdog_timeout = None
-        self.runner = QueueJobRunner.from_environ_or_config()
+        self.runner = _runner_class().from_environ_or_config()
         self._recover = False
 
     def sleep(self):
@@ -67,7 +98,7 @@ class WorkerJobRunner(server.Worker):
     def process_work(self):
         if self._recover:
             _logger.info("WorkerJobRunner (%s) runner is reinitialized", self.pid)
-            self.runner = QueueJobRunner.from_environ_or_config()
+            self.runner = _runner_class().from_environ_or_config()
             self._recover = False
         _logger.debug("WorkerJobRunner (%s) starting up", self.pid)
         time.sleep(START_DELAY)
@@ -83,6 +114,76 @@ class WorkerJobRunner(server.Worker):
         self.runner.stop()
 
 
+def _get_run_job_controller(env):
+    """Return the controller serving ``/queue_job/runjob`` on a database
+
+    Its class includes the overrides of the installed addons, which
+    instantiating ``RunJobController`` directly would bypass.
+    """
+    adapter = env["ir.http"].routing_map().bind("")
+    rule, _args = adapter.match("/queue_job/runjob", return_rule=True)
+    # the endpoint wraps the method bound to the controller
+    method = getattr(rule.endpoint, "func", rule.endpoint)
+    return method.__self__
+
+
+class WorkerJobExecutor(server.Worker):
+    """Job executor workers
+
+    They accept the jobs to run from the runner on a local socket and run
+    them like the ``/queue_job/runjob`` route does, without the HTTP layer.
+    """
+
+    def sleep(self):
+        try:
+            select.select(
+                [self.multi.queue_job_executor_socket, self.wakeup_fd_r],
+                [],
+                [],
+                self.multi.beat,
+            )
+            server.empty_pipe(self.wakeup_fd_r)
+        except OSError as e:
+            if e.errno != errno.EINTR:
+                raise
+
+    def start(self):
+        super().start()
+        self.multi.queue_job_executor_socket.setblocking(False)
+
+    def process_work(self):
+        try:
+            client, _addr = self.multi.queue_job_executor_socket.accept()
+        except OSError as e:
+            if e.errno not in (errno.EAGAIN, errno.ECONNABORTED):
+                raise
+            return
+        with client, client.makefile("rb") as stream:
+            client.settimeout(1)
+            try:
+                message = stream.readline().decode()
+            except OSError:
+                _logger.exception("could not read the job to run")
+                return
+        try:
+            db_name, job_uuid = message.split()
+        except ValueError:
+            _logger.error("invalid job to run: %r", message)
+            return
+        self.run_job(db_name, job_uuid)
+        self.request_count += 1
+
+    def run_job(self, db_name, job_uuid):
+        try:
+            registry = Registry(db_name).check_signaling()
+            with registry.manage_changes(), registry.cursor() as cr:
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                _get_run_job_controller(env)._runjob(env, job_uuid)
+        except Exception:
+            # the failure is stored on the job by _runjob
+            _logger.exception("error running job %s on db %s", job_uuid, db_name)
+
+
 runner_thread = None
 
 
@@ -112,9 +213,32 @@ orig_threaded_start = server.ThreadedServer.start
 orig_threaded_stop = server.ThreadedServer.stop
 
 
+def _create_executor_socket():
+    path = _executor_socket_path()
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # the socket must be private from its creation, as the jobs it receives
+    # are run as superuser
+    umask = os.umask(0o177)
+    try:
+        sock.bind(path)
+    finally:
+        os.umask(umask)
+    sock.listen(socket.SOMAXCONN)
+    _logger.info("job executors listening on %s", path)
+    return sock
+
+
 def prefork__init__(server, app):
     res = orig_prefork__init__(server, app)
     server.jobrunner = {}
+    server.queue_job_executors = {}
+    server.queue_job_executor_socket = None
+    if _is_runner_enabled() and _executor_workers():
+        server.queue_job_executor_socket = _create_executor_socket()
     return res
 
 
@@ -126,6 +250,9 @@ def prefork_process_spawn(server):
         return
     if not server.jobrunner and _is_runner_enabled():
         server.worker_spawn(WorkerJobRunner, server.jobrunner)
+    if server.queue_job_executor_socket:
+        while len(server.queue_job_executors) < _executor_workers():
+            server.worker_spawn(WorkerJobExecutor, server.queue_job_executors)
 
 
 def prefork_worker_pop(server, pid):
@@ -136,6 +263,7 @@ def prefork_worker_pop(server, pid):
         return res
     if pid in server.jobrunner:
         server.jobrunner.pop(pid)
+    server.queue_job_executors.pop(pid, None)
     return res
 
 
@@ -0,0 +1,296 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+"""
+Job runner running on an asyncio event loop.
+
+It is selected with ``ODOO_QUEUE_JOB_RUNNER=asyncio`` (or ``runner = asyncio``
+in the ``[queue_job]`` section of the configuration file) and requires the
+``aiohttp`` library.
+
+It behaves like :class:`~.runner.QueueJobRunner`, with the same channels and
+database handling, but:
+
+* the LISTEN connections are watched by the event loop instead of
+  ``select()``;
+* the ``/queue_job/runjob`` requests are coroutines sharing one pool of
+  kept-alive connections (``http_pool_size`` connections): at most
+  ``http_pool_size`` requests are sent at once, the others wait for a free
+  connection in a coroutine instead of a thread, and this wait does not
+  count in the request timeout;
+* the database work (connecting, loading the jobs, reading the
+  notifications, marking the jobs enqueued) runs in a dedicated thread,
+  one step at a time, so the event loop keeps sending the requests
+  meanwhile, even while the jobs of a large queue are loaded.
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+import logging
+import time
+
+import psycopg2
+
+from .runner import (
+    DEFAULT_HTTP_POOL_SIZE,
+    DISPATCHER_STOP_TIMEOUT,
+    ERROR_RECOVERY_DELAY,
+    HttpDispatcher,
+    MasterElectionLost,
+    QueueJobRunner,
+    _set_jobs_pending,
+)
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+_logger = logging.getLogger(__name__)
+
+
+class AsyncHttpDispatcher:
+    """Send the ``/queue_job/runjob`` requests from the event loop.
+
+    Same interface as :class:`~.runner.HttpDispatcher`. The number of
+    concurrent requests is limited to ``pool_size``, requests exceeding
+    it wait for a free connection without blocking the runner, so
+    ``queue_size`` is not used. The one second timeout only starts once a
+    connection is available.
+    """
+
+    def __init__(
+        self,
+        scheme="http",
+        host="localhost",
+        port=8069,
+        user=None,
+        password=None,
+        pool_size=DEFAULT_HTTP_POOL_SIZE,
+        queue_size=0,
+    ):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.pool_size = max(int(pool_size), 1)
+        self.queue_size = 0
+        self._session = None
+        self._loop = None
+        self._semaphore = None
+        self._tasks = set()
+        self._in_flight = 0
+        self._dispatched = 0
+        self._errors = 0
+
+    def start(self):
+        """Open the HTTP session, must be called from the event loop"""
+        if self._session:
+            return
+        self._loop = asyncio.get_running_loop()
+        # requests wait here rather than in the connector pool, where the
+        # wait would count in the request timeout
+        self._semaphore = asyncio.Semaphore(self.pool_size)
+        auth = None
+        if self.user:
+            auth = aiohttp.BasicAuth(self.user, self.password or "")
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.pool_size),
+            # we are not interested in the result, so we set a short timeout
+            # but not too short so we trap and log hard configuration errors
+            timeout=aiohttp.ClientTimeout(total=1),
+            auth=auth,
+        )
+
+    async def stop(self, timeout=DISPATCHER_STOP_TIMEOUT):
+        """Wait for the requests in flight and close the HTTP session
+
+        The requests not sent within ``timeout`` seconds are cancelled and
+        their jobs set back to pending.
+        """
+        if self._tasks:
+            _done, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+        if self._session:
+            await self._session.close()
+            self._session = None
+
+    def dispatch(self, db_name, job_uuid):
+        self.dispatch_many(db_name, [job_uuid])
+
+    def dispatch_many(self, db_name, job_uuids):
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            self._create_task(db_name, job_uuids)
+        else:
+            # called by run_jobs from the database thread of the runner
+            self._loop.call_soon_threadsafe(self._create_task, db_name, job_uuids)
+
+    def _create_task(self, db_name, job_uuids):
+        task = self._loop.create_task(self._run_job(db_name, job_uuids))
+        # keep a reference on the task until it is done
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def stats(self):
+        return {
+            "pool_size": self.pool_size,
+            "queue_size": self.queue_size,
+            "queue_depth": len(self._tasks) - self._in_flight,
+            "in_flight": self._in_flight,
+            "dispatched": self._dispatched,
+            "errors": self._errors,
+        }
+
+    _url = HttpDispatcher._url
+
+    async def _run_job(self, db_name, job_uuids):
+        url = self._url(db_name, job_uuids)
+        try:
+            async with self._semaphore:
+                await self._send(db_name, job_uuids, url)
+        except asyncio.CancelledError:
+            _logger.warning(
+                "stopping, jobs %s on db %s not sent", ", ".join(job_uuids), db_name
+            )
+            await self._set_jobs_pending(db_name, job_uuids)
+            raise
+
+    async def _send(self, db_name, job_uuids, url):
+        self._in_flight += 1
+        try:
+            async with self._session.get(url) as response:
+                response.raise_for_status()
+        except asyncio.TimeoutError:
+            # the jobs of a batch wait for the previous ones: they are
+            # expected to be still enqueued once the first job started
+            await self._set_jobs_pending(
+                db_name, job_uuids, unless_started=job_uuids[0]
+            )
+        except Exception:
+            _logger.exception("exception in GET %s", url)
+            self._errors += 1
+            await self._set_jobs_pending(db_name, job_uuids)
+        finally:
+            self._in_flight -= 1
+            self._dispatched += 1
+
+    async def _set_jobs_pending(self, db_name, job_uuids, unless_started=None):
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(
+                None,
+                functools.partial(
+                    _set_jobs_pending,
+                    db_name,
+                    job_uuids,
+                    unless_started=unless_started,
+                ),
+            )
+        except Exception:
+            _logger.exception(
+                "could not reset the state of jobs %s", ", ".join(job_uuids)
+            )
+
+
+class AsyncQueueJobRunner(QueueJobRunner):
+    dispatcher_class = AsyncHttpDispatcher
+
+    def run(self):
+        asyncio.run(self._run())
+
+    async def _run_db_step(self, func):
+        """Run a blocking database step in the database thread
+
+        A single thread runs the steps one after the other, and the event
+        loop waits for each of them, so the channels and the connections are
+        never used by two steps at once. A step cancelled on stop still runs
+        to its end before the next one.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._db_executor, func)
+
+    async def _run(self):
+        _logger.info("starting")
+        self.dispatcher.start()
+        self._db_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="queue_job_runner_db"
+        )
+        while not self._stop:
+            # outer loop does exception recovery
+            try:
+                _logger.debug("initializing database connections")
+                await self._run_db_step(self.initialize_databases)
+                _logger.info("database connections ready")
+                # inner loop does the normal processing
+                while not self._stop:
+                    if time.monotonic() >= self._next_discovery:
+                        await self._run_db_step(self.discover_databases)
+                    if self._failed_dbs:
+                        await self._run_db_step(self.reconnect_databases)
+                    await self._run_db_step(self.process_notifications)
+                    await self._run_db_step(self.run_jobs)
+                    await self.wait_notification_async()
+            except (KeyboardInterrupt, asyncio.CancelledError):
+                self.stop()
+            except MasterElectionLost as e:
+                _logger.debug(
+                    "master election lost: %s, sleeping %ds and retrying",
+                    e,
+                    ERROR_RECOVERY_DELAY,
+                )
+                await self._run_db_step(self.close_databases)
+                await asyncio.sleep(ERROR_RECOVERY_DELAY)
+            except Exception:
+                _logger.exception(
+                    "exception: sleeping %ds and retrying", ERROR_RECOVERY_DELAY
+                )
+                await self._run_db_step(self.close_databases)
+                await asyncio.sleep(ERROR_RECOVERY_DELAY)
+        await self._run_db_step(
+            functools.partial(self.close_databases, remove_jobs=False)
+        )
+        self._db_executor.shutdown()
+        if isinstance(self.dispatcher, AsyncHttpDispatcher):
+            await self.dispatcher.stop()
+        else:
+            self.dispatcher.stop()
+        _logger.info("stopped")
+
+    async def wait_notification_async(self):
+        timeout = self._get_wait_timeout()
+        if not timeout or self._stop:
+            # let the requests dispatched by run_jobs start, even when
+            # notifications keep coming
+            await asyncio.sleep(0)
+            return
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+
+        def on_readable(db_name):
+            db = self.db_by_name.get(db_name)
+            # the stop pipe is not a conn so doesn't need poll()
+            if db:
+                try:
+                    db.conn.poll()
+                except psycopg2.Error:
+                    self._database_failed(db_name)
+            wakeup.set()
+
+        fds = [(db.conn.fileno(), db.db_name) for db in self.db_by_name.values()]
+        fds.append((self._stop_pipe[0], None))
+        for fd, db_name in fds:
+            loop.add_reader(fd, on_readable, db_name)
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            for fd, _db_name in fds:
+                loop.remove_reader(fd)
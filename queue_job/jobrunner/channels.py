@@ -2,9 +2,11 @@
 # Copyright 2015-2016 Camptocamp SA
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
 import logging
-from collections import namedtuple
+import time
+from collections import defaultdict, namedtuple
 from functools import total_ordering
-from heapq import heappop, heappush
+from heapq import heapify, heappop, heappush
+from itertools import count
 from weakref import WeakValueDictionary
 
 from ..exception import ChannelNotFound
@@ -46,12 +48,45 @@ class PriorityQueue:
     >>> q.add(2)
     >>> q.pop()
     2
+
+    Many objects can be added at once.
+
+    >>> q.add_many([5, 4, 6, 4])
+    >>> len(q)
+    3
+    >>> q.pop()
+    4
+
+    Removed objects stay in the heap until they reach its top, unless they
+    make up more than half of it, in which case the heap is rebuilt without
+    them. So the memory used by a queue in which objects are added then
+    removed without being popped stays bounded.
+
+    >>> q = PriorityQueue()
+    >>> q.add(0)
+    >>> for i in range(1, 1000001):
+    ...     q.add(i)
+    ...     q.remove(i)
+    >>> len(q), len(q._heap) <= 2 * q.COMPACT_MIN_SIZE
+    (1, True)
+    >>> stats = q.stats()
+    >>> stats["size"], stats["compactions"] > 0
+    (1, True)
+    >>> q.pop()
+    0
     """
 
+    # rebuild the heap when removed objects are more than this ratio of it
+    COMPACT_RATIO = 0.5
+    # but don't bother for small heaps
+    COMPACT_MIN_SIZE = 1024
+
     def __init__(self):
         self._heap = []
         self._known = set()  # all objects in the heap (including removed)
         self._removed = set()  # all objects that have been removed
+        self._compactions = 0
+        self._compaction_time = 0.0
 
     def __len__(self):
         return len(self._known) - len(self._removed)
@@ -83,12 +118,57 @@ class PriorityQueue:
         self._known.add(o)
         heappush(self._heap, o)
 
+    def add_many(self, objects):
+        """Add several objects, rebuilding the heap at once when it is
+        cheaper than pushing them one by one"""
+        new = []
+        for o in objects:
+            if o is None:
+                raise ValueError()
+            self._removed.discard(o)
+            if o in self._known:
+                continue
+            self._known.add(o)
+            new.append(o)
+        if len(new) * 4 < len(self._heap):
+            for o in new:
+                heappush(self._heap, o)
+        else:
+            self._heap.extend(new)
+            heapify(self._heap)
+
     def remove(self, o):
         if o is None:
             raise ValueError()
         if o not in self._known:
             return
         self._removed.add(o)
+        removed = len(self._removed)
+        if (
+            removed > self.COMPACT_MIN_SIZE
+            and removed > len(self._heap) * self.COMPACT_RATIO
+        ):
+            self._compact()
+
+    def _compact(self):
+        """Rebuild the heap without the removed objects"""
+        start = time.perf_counter()
+        self._heap = [o for o in self._heap if o not in self._removed]
+        heapify(self._heap)
+        self._known.difference_update(self._removed)
+        self._removed = set()
+        self._compactions += 1
+        self._compaction_time += time.perf_counter() - start
+
+    def stats(self):
+        """Return counters about the memory and time used by the queue"""
+        return {
+            "size": len(self),
+            "heap_size": len(self._heap),
+            "removed": len(self._removed),
+            "compactions": self._compactions,
+            "compaction_time": self._compaction_time,
+        }
 
     def pop(self):
         while True:
@@ -328,6 +408,10 @@ class ChannelQueue:
         else:
             self._queue.add(job)
 
+    def add_many(self, jobs):
+        self._eta_queue.add_many(job for job in jobs if job.eta)
+        self._queue.add_many(job for job in jobs if not job.eta)
+
     def remove(self, job):
         self._eta_queue.remove(job)
         self._queue.remove(job)
@@ -357,6 +441,121 @@ class ChannelQueue:
         return wakeup_time
 
 
+class ChannelTimers:
+    """The timers of all the channels of a channel tree.
+
+    The timer of a channel is the time at which something may happen in it
+    without any notification: the end of its throttle pause, or else the
+    eta of its next job with an eta.
+
+    Timers are kept in two heaps, with outdated entries left in them until
+    they reach the top. The first one is used to visit the channels at the
+    time of their timer. The second one gives the time at which the runner
+    must wake up: timers masked by a channel that is full or paused are set
+    aside in this channel until it can run jobs again, as they would not
+    make any job run.
+
+    >>> root = Channel('root', None, capacity=1)
+    >>> a = Channel('a', root)
+    >>> j1 = ChannelJob(None, a, 1,
+    ...                 seq=0, date_created=1, priority=1, eta=None)
+    >>> j2 = ChannelJob(None, a, 2,
+    ...                 seq=0, date_created=2, priority=1, eta=10)
+    >>> a.set_pending(j1)
+    >>> a.set_pending(j2)
+    >>> timers = root._timers
+    >>> timers.get_wakeup_time()
+    10
+    >>> list(root.get_jobs_to_run(now=1))
+    [<ChannelJob 1>]
+
+    The root channel is full, so the eta of job 2 is not a reason to
+    wake up anymore.
+
+    >>> timers.get_wakeup_time()
+    0
+    >>> a.set_done(j1)
+    >>> timers.get_wakeup_time()
+    10
+    >>> list(root.get_jobs_to_run(now=2))
+    []
+
+    Channel a is visited again when its timer is past.
+
+    >>> root._dirty_children
+    set()
+    >>> timers.fire(now=10)
+    >>> root._dirty_children == {a}
+    True
+    >>> list(root.get_jobs_to_run(now=10))
+    [<ChannelJob 2>]
+    """
+
+    # don't rebuild the heaps without outdated entries below this size
+    COMPACT_MIN_SIZE = 1024
+
+    def __init__(self):
+        self._heap = []  # (time, seq, channel)
+        self._wakeup_heap = []  # same, without the masked timers
+        self._seq = count()
+        self._compact_size = self.COMPACT_MIN_SIZE
+
+    def push(self, channel, timer):
+        entry = (timer, next(self._seq), channel)
+        heappush(self._heap, entry)
+        heappush(self._wakeup_heap, entry)
+        if len(self._heap) > self._compact_size:
+            self._compact()
+
+    def _compact(self):
+        """Rebuild the heaps without the outdated entries, so they don't
+        grow when timers are moved further in the future"""
+        self._heap = [e for e in self._heap if e[2]._timer == e[0]]
+        self._wakeup_heap = [e for e in self._wakeup_heap if e[2]._timer == e[0]]
+        heapify(self._heap)
+        heapify(self._wakeup_heap)
+        self._compact_size = max(self.COMPACT_MIN_SIZE, 2 * len(self._heap))
+
+    def release(self, channel):
+        """Take into account the timer of a channel that was set aside"""
+        if channel._timer is None:
+            # its timer has been fired
+            channel._update_timer()
+        elif channel._timer:
+            heappush(self._wakeup_heap, (channel._timer, next(self._seq), channel))
+
+    def fire(self, now):
+        """Mark the channels whose timer is past as having jobs to run"""
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            timer, _seq, channel = heappop(heap)
+            if channel._timer != timer:
+                # outdated
+                continue
+            channel._timer = None
+            if channel.has_capacity():
+                channel._mark_dirty()
+            else:
+                # nothing will happen until a job is done in the channel,
+                # which will update its timer
+                channel._masked_timers.add(channel)
+
+    def get_wakeup_time(self):
+        heap = self._wakeup_heap
+        while heap:
+            timer, _seq, channel = heap[0]
+            if channel._timer != timer:
+                # outdated
+                heappop(heap)
+                continue
+            masking_channel = channel._get_masking_channel()
+            if masking_channel is None:
+                return timer
+            heappop(heap)
+            masking_channel._masked_timers.add(channel)
+        return 0
+
+
 class Channel:
     """A channel for jobs, with a maximum capacity.
 
@@ -402,20 +601,84 @@ class Channel:
     with a capacity of 1. It is also possible to dedicate a channel with a
     limited capacity for application-autocreated subchannels
     without risking to overflow the system.
+
+    When some children of a channel have a ``weight``, the jobs coming from
+    its children are not ordered by priority anymore but shared between the
+    children in proportion of their weight (1 by default), so a child with a
+    large backlog does not starve its siblings. This uses stride scheduling:
+    each child has a pass value, increased by ``1 / weight`` when one of its
+    jobs is run, and the next job is taken from the child with the lowest
+    pass. The jobs of the channel itself are shared like those of a child
+    with a weight of 1. Weights are ignored in sequential channels.
+
+    Only the children channels that may have jobs to run are visited: a
+    channel is marked dirty in its parent when a job is queued in it, when
+    it gets capacity back or when its timer is past (see
+    :class:`ChannelTimers`), and it stays so until none of its children
+    channels is dirty.
+
+    >>> root = Channel('root', None, capacity=2)
+    >>> a = Channel('a', root, capacity=1)
+    >>> b = Channel('b', root)
+    >>> j1 = ChannelJob(None, a, 1,
+    ...                 seq=0, date_created=1, priority=1, eta=None)
+    >>> j2 = ChannelJob(None, a, 2,
+    ...                 seq=0, date_created=2, priority=1, eta=None)
+    >>> a.set_pending(j1)
+    >>> a.set_pending(j2)
+    >>> root._dirty_children == {a}
+    True
+    >>> list(root.get_jobs_to_run(now=100))
+    [<ChannelJob 1>]
+
+    Channel a is full, nothing will happen in it until j1 is done.
+
+    >>> root._dirty_children
+    set()
+    >>> a.set_done(j1)
+    >>> root._dirty_children == {a}
+    True
+    >>> list(root.get_jobs_to_run(now=100))
+    [<ChannelJob 2>]
     """
 
-    def __init__(self, name, parent, capacity=None, sequential=False, throttle=0):
+    def __init__(
+        self,
+        name,
+        parent,
+        capacity=None,
+        sequential=False,
+        throttle=0,
+        rate=0,
+        burst=1,
+    ):
         self.name = name
         self.parent = parent
         if self.parent:
             self.parent.children[name] = self
         self.children = {}
+        # children channels that may have jobs to run
+        self._dirty_children = set()
+        self._timers = parent._timers if parent else ChannelTimers()
+        self._timer = 0  # None when it has been fired
+        # channels whose timer is masked by this channel
+        self._masked_timers = set()
         self._queue = ChannelQueue()
+        # queues of the jobs coming from weighted children channels
+        self._child_queues = {}
+        self._passes = {}  # pass value of the channel and its children
+        self._pass = 0  # pass value of the last job run
+        self._fair_share = False  # whether children channels have a weight
+        self.weight = None
         self._running = set()
         self._failed = set()
         self._pause_until = 0  # utc seconds since the epoch
         self.capacity = capacity
         self.throttle = throttle  # seconds
+        self.rate = rate  # jobs per second
+        self.burst = burst
+        # time at which the token bucket of the rate limit is full again
+        self._full_bucket_time = 0
         self.sequential = sequential
 
     @property
@@ -434,13 +697,32 @@ class Channel:
         * capacity
         * sequential
         * throttle
+        * rate
+        * burst
+        * weight
         """
         assert self.fullname.endswith(config["name"])
         self.capacity = config.get("capacity", None)
         self.sequential = bool(config.get("sequential", False))
         self.throttle = int(config.get("throttle", 0))
+        self.rate = float(config.get("rate", 0))
+        self.burst = int(config.get("burst", 1))
+        weight = config.get("weight")
+        self.weight = int(weight) if weight is not None else None
         if self.sequential and self.capacity != 1:
             raise ValueError("A sequential channel must have a capacity of 1")
+        if self.rate < 0:
+            raise ValueError("The rate of a channel must not be negative")
+        if self.burst < 1:
+            raise ValueError("The burst of a channel must be at least 1")
+        if self.weight is not None and self.weight < 1:
+            raise ValueError("The weight of a channel must be at least 1")
+        if self.parent:
+            self.parent._fair_share = any(
+                child.weight for child in self.parent.children.values()
+            )
+        self._mark_dirty()
+        self._update_timer()
 
     @property
     def fullname(self):
@@ -450,6 +732,53 @@ class Channel:
         else:
             return self.name
 
+    def _mark_dirty(self):
+        """Have the parent channels visit this channel at their next run"""
+        channel = self
+        while channel.parent and channel not in channel.parent._dirty_children:
+            channel.parent._dirty_children.add(channel)
+            channel = channel.parent
+
+    def _is_idle(self):
+        """Whether there is no job to run in this channel until something
+        changes in its queue or its capacity, or its timer is past"""
+        return not self._dirty_children
+
+    def _update_timer(self):
+        """Keep the timer of the channel in sync with its pause and queue"""
+        if self._pause_until:
+            timer = self._pause_until
+        else:
+            timer = self._queue.get_wakeup_time()
+        if timer != self._timer:
+            self._timer = timer
+            if timer:
+                self._timers.push(self, timer)
+        if not self._masked_timers or not self.has_capacity():
+            return
+        if not self._pause_until:
+            masked_timers, self._masked_timers = self._masked_timers, set()
+        elif self in self._masked_timers:
+            # the pause of the channel only masks the timers of its children
+            masked_timers = [self]
+            self._masked_timers.discard(self)
+        else:
+            return
+        for channel in masked_timers:
+            self._timers.release(channel)
+
+    def _get_masking_channel(self):
+        """Return the channel preventing the timer of this channel to make
+        jobs run, because it is full or paused"""
+        if not self.has_capacity():
+            return self
+        channel = self.parent
+        while channel:
+            if channel._pause_until or not channel.has_capacity():
+                return channel
+            channel = channel.parent
+        return None
+
     def get_subchannel_by_name(self, subchannel_name):
         return self.children.get(subchannel_name)
 
@@ -458,16 +787,32 @@ class Channel:
         return "%s(C:%s,Q:%d,R:%d,F:%d)" % (
             self.fullname,
             capacity,
-            len(self._queue),
+            len(self._queue) + sum(len(q) for q in self._child_queues.values()),
             len(self._running),
             len(self._failed),
         )
 
+    def _get_child_queue(self, job):
+        """Return the queue of the weighted child channel the job comes from"""
+        channel = job.channel
+        while channel and channel.parent is not self:
+            channel = channel.parent
+        return self._child_queues.get(channel)
+
+    def _remove_from_queue(self, job):
+        self._queue.remove(job)
+        if self._child_queues:
+            child_queue = self._get_child_queue(job)
+            if child_queue is not None:
+                child_queue.remove(job)
+
     def remove(self, job):
         """Remove a job from the channel."""
-        self._queue.remove(job)
+        self._remove_from_queue(job)
         self._running.discard(job)
         self._failed.discard(job)
+        self._mark_dirty()
+        self._update_timer()
         if self.parent:
             self.parent.remove(job)
 
@@ -489,19 +834,33 @@ class Channel:
             self._queue.add(job)
             self._running.discard(job)
             self._failed.discard(job)
+            self._mark_dirty()
+            self._update_timer()
             if self.parent:
                 self.parent.remove(job)
             _logger.debug("job %s marked pending in channel %s", job.uuid, self)
 
+    def add_pending_jobs(self, jobs):
+        """Put new jobs in the channel queue.
+
+        Unlike :meth:`set_pending`, the jobs are expected to be unknown to
+        this channel and its parents, which allows adding them at once.
+        """
+        self._queue.add_many(jobs)
+        self._mark_dirty()
+        self._update_timer()
+        _logger.debug("%d jobs marked pending in channel %s", len(jobs), self)
+
     def set_running(self, job):
         """Mark a job as running.
 
         This also marks the job as running in parent channels.
         """
         if job not in self._running:
-            self._queue.remove(job)
+            self._remove_from_queue(job)
             self._running.add(job)
             self._failed.discard(job)
+            self._update_timer()
             if self.parent:
                 self.parent.set_running(job)
             _logger.debug("job %s marked running in channel %s", job.uuid, self)
@@ -512,6 +871,8 @@ class Channel:
             self._queue.remove(job)
             self._running.discard(job)
             self._failed.add(job)
+            self._mark_dirty()
+            self._update_timer()
             if self.parent:
                 self.parent.remove(job)
             _logger.debug("job %s marked failed in channel %s", job.uuid, self)
@@ -536,22 +897,43 @@ class Channel:
         no job until at least throttle seconds have elapsed since the previous
         yield.
 
+        If the ``rate`` option is set on the channel, then it yields at most
+        ``rate`` jobs per second, with bursts of at most ``burst`` jobs. This
+        is a token bucket holding up to ``burst`` tokens and refilled with
+        ``rate`` tokens per second, each job taking one token. When it is
+        empty and jobs are waiting, the channel is paused until the next token
+        is available.
+
         :param now: the current datetime in seconds
 
         :return: iterator of
                  :class:`odoo.addons.queue_job.jobrunner.ChannelJob`
         """
+        if not self.parent:
+            self._timers.fire(now)
+        yield from self._get_jobs_to_run(now)
+        self._update_timer()
+
+    def _get_jobs_to_run(self, now):
         # enqueue jobs of children channels
-        for child in self.children.values():
+        for child in list(self._dirty_children):
+            if self._fair_share and not self.sequential:
+                queue = self._child_queues.get(child)
+                if queue is None:
+                    queue = self._child_queues[child] = ChannelQueue()
+            else:
+                queue = self._queue
             for job in child.get_jobs_to_run(now):
-                self._queue.add(job)
+                queue.add(job)
+            if child._is_idle():
+                self._dirty_children.discard(child)
         # is this channel paused?
-        if self.throttle and self._pause_until:
+        if self._pause_until:
             if now < self._pause_until:
                 if self.has_capacity():
                     _logger.debug(
                         "channel %s paused until %s because "
-                        "of throttle delay between jobs",
+                        "of throttle delay or rate limit",
                         self,
                         self._pause_until,
                     )
@@ -563,10 +945,23 @@ class Channel:
                 _logger.debug("channel %s unpaused at %s", self, now)
         # yield jobs that are ready to run, while we have capacity
         while self.has_capacity():
-            job = self._queue.pop(now)
+            if self.rate and now < self._get_next_token_time():
+                if self._queue or any(self._child_queues.values()):
+                    self._pause_until = self._get_next_token_time()
+                    _logger.debug(
+                        "pausing channel %s until %s because of rate limit",
+                        self,
+                        self._pause_until,
+                    )
+                return
+            job = self._pop(now)
             if not job:
                 return
             self._running.add(job)
+            if self.rate:
+                self._full_bucket_time = (
+                    max(self._full_bucket_time, now) + 1 / self.rate
+                )
             _logger.debug("job %s marked running in channel %s", job.uuid, self)
             yield job
             if self.throttle:
@@ -574,25 +969,39 @@ class Channel:
                 _logger.debug("pausing channel %s until %s", self, self._pause_until)
                 return
 
-    def get_wakeup_time(self, wakeup_time=0):
-        if not self.has_capacity():
-            # this channel is full, do not request timed wakeup, as
-            # a notification will wakeup the runner when a job finishes
-            return wakeup_time
-        if self._pause_until:
-            # this channel is paused, request wakeup at the end of the pause
-            if not wakeup_time:
-                wakeup_time = self._pause_until
-            else:
-                wakeup_time = min(wakeup_time, self._pause_until)
-            # since this channel is paused, no need to look at the
-            # wakeup time of children nor eta jobs, as such jobs would not
-            # run anyway because they would end up in this paused channel
-            return wakeup_time
-        wakeup_time = self._queue.get_wakeup_time(wakeup_time)
-        for child in self.children.values():
-            wakeup_time = child.get_wakeup_time(wakeup_time)
-        return wakeup_time
+    def _get_next_token_time(self):
+        """Time at which the token bucket of the rate limit has a token
+
+        The bucket is empty ``burst / rate`` seconds before being full, so
+        it has a token from ``(burst - 1) / rate`` seconds before.
+        """
+        return self._full_bucket_time - (self.burst - 1) / self.rate
+
+    def _pop(self, now):
+        """Pop the next job to run from the channel queue and the queues of
+        the weighted children channels"""
+        if not self._child_queues:
+            return self._queue.pop(now)
+        candidates = [(self, self._queue)] + sorted(
+            self._child_queues.items(), key=lambda item: item[0].name
+        )
+        # a channel with no job to run for some time gets no credit for it
+        candidates = sorted(
+            (
+                (max(self._passes.get(channel, 0), self._pass), channel, queue)
+                for channel, queue in candidates
+                if queue
+            ),
+            key=lambda candidate: candidate[0],
+        )
+        for pass_, channel, queue in candidates:
+            job = queue.pop(now)
+            if job:
+                weight = channel.weight if channel is not self else None
+                self._pass = pass_
+                self._passes[channel] = pass_ + 1 / (weight or 1)
+                return job
+        return None
 
 
 def split_strip(s, sep, maxsplit=-1):
@@ -799,6 +1208,47 @@ class ChannelManager:
     >>> cm.notify(db, 'S', 'S3', 3, 0, 10, None, 'done')
     >>> pp(list(cm.get_jobs_to_run(now=105)))
     []
+
+    Test rate limit with a token bucket: 2 jobs per second, with bursts of
+    3 jobs.
+
+    >>> cm = ChannelManager()
+    >>> cm.simple_configure('root:10,R:10:rate=2:burst=3')
+    >>> for i in range(8):
+    ...     cm.notify(db, 'R', 'R%d' % i, i, 0, 10, None, 'pending')
+    >>> pp(list(cm.get_jobs_to_run(now=100)))
+    [<ChannelJob R0>, <ChannelJob R1>, <ChannelJob R2>]
+
+    The runner wakes up when the next token is available.
+
+    >>> cm.get_wakeup_time()
+    100.5
+    >>> pp(list(cm.get_jobs_to_run(now=100.2)))
+    []
+    >>> pp(list(cm.get_jobs_to_run(now=100.5)))
+    [<ChannelJob R3>]
+    >>> cm.get_wakeup_time()
+    101.0
+    >>> pp(list(cm.get_jobs_to_run(now=101.5)))
+    [<ChannelJob R4>, <ChannelJob R5>]
+    >>> cm.get_wakeup_time()
+    102.0
+
+    Test fair share between channels with a weight. Channel A has a
+    backlog of older jobs, but B gets one job out of four.
+
+    >>> cm = ChannelManager()
+    >>> cm.simple_configure('root:4,A:8:weight=3,B:8:weight=1')
+    >>> for i in range(8):
+    ...     cm.notify(db, 'A', 'A%d' % i, i, 0, 10, None, 'pending')
+    >>> for i in range(8):
+    ...     cm.notify(db, 'B', 'B%d' % i, 10 + i, 0, 10, None, 'pending')
+    >>> pp(list(cm.get_jobs_to_run(now=100)))
+    [<ChannelJob A0>, <ChannelJob B0>, <ChannelJob A1>, <ChannelJob A2>]
+    >>> for uuid in ('A0', 'B0', 'A1', 'A2'):
+    ...     cm.remove_job(uuid)
+    >>> pp(list(cm.get_jobs_to_run(now=101)))
+    [<ChannelJob A3>, <ChannelJob B1>, <ChannelJob A4>, <ChannelJob A5>]
     """
 
     def __init__(self):
@@ -1031,13 +1481,14 @@ class ChannelManager:
         if job:
             # db_name is invariant
             assert job.db_name == db_name
-            # date_created is invariant
-            assert job.date_created == date_created
             # if one of the job properties that influence
             # scheduling order has changed, we remove the job
-            # from the queues and create a new job object
+            # from the queues and create a new job object;
+            # date_created is invariant, but the value read from a
+            # notification may differ from the database (precision)
             if (
                 seq != job.seq
+                or date_created != job.date_created
                 or priority != job.priority
                 or eta != job.eta
                 or channel != job.channel
@@ -1063,6 +1514,61 @@ class ChannelManager:
         else:
             _logger.error("unexpected state %s for job %s", state, job)
 
+    def load_jobs(self, db_name, job_datas):
+        """Notify a batch of jobs, such as the jobs of a database at startup.
+
+        This is equivalent to calling :meth:`notify` for each job, but the
+        pending jobs that were not known yet are added to the queues of their
+        channels at once.
+
+        >>> cm = ChannelManager()
+        >>> cm.simple_configure('root:3,A:1')
+        >>> cm.load_jobs('db', [
+        ...     ('A', 'A1', 1, 0, 10, None, 'enqueued'),
+        ...     ('A', 'A2', 2, 0, 5, None, 'pending'),
+        ...     (None, 'R1', 3, 0, 10, None, 'pending'),
+        ...     (None, 'R2', 4, 0, 5, None, 'pending'),
+        ...     (None, 'R1', 3, 0, 10, None, 'done'),
+        ... ])
+        >>> list(cm.get_jobs_to_run(now=100))
+        [<ChannelJob R2>]
+        >>> cm.notify('db', 'A', 'A1', 1, 0, 10, None, 'done')
+        >>> list(cm.get_jobs_to_run(now=100))
+        [<ChannelJob A2>]
+        """
+        channels = {}
+        pending_by_channel = defaultdict(list)
+        pending_uuids = set()
+
+        def add_pending_jobs():
+            for channel, jobs in pending_by_channel.items():
+                channel.add_pending_jobs(jobs)
+            pending_by_channel.clear()
+            pending_uuids.clear()
+
+        for job_data in job_datas:
+            channel_name, uuid, seq, date_created, priority, eta, state = job_data
+            if state != PENDING or uuid in self._jobs_by_uuid:
+                if uuid in pending_uuids:
+                    # the job appears twice, it must be in its channel
+                    # before the second state is applied
+                    add_pending_jobs()
+                self.notify(db_name, *job_data)
+                continue
+            channel = channels.get(channel_name)
+            if channel is None:
+                channel = channels[channel_name] = self.get_channel_by_name(
+                    channel_name, parent_fallback=True
+                )
+            job = ChannelJob(db_name, channel, uuid, seq, date_created, priority, eta)
+            self._jobs_by_uuid[uuid] = job
+            pending_by_channel[channel].append(job)
+            pending_uuids.add(uuid)
+        add_pending_jobs()
+
+    def get_job(self, uuid):
+        return self._jobs_by_uuid.get(uuid)
+
     def remove_job(self, uuid):
         job = self._jobs_by_uuid.get(uuid)
         if job:
@@ -1079,4 +1585,4 @@ class ChannelManager:
         return self._root_channel.get_jobs_to_run(now)
 
     def get_wakeup_time(self):
-        return self._root_channel.get_wakeup_time()
+        return self._root_channel._timers.get_wakeup_time()
@@ -31,6 +31,43 @@ How to use it?
   - ``ODOO_QUEUE_JOB_PORT=443``, default ``http_port`` or 8069 if unset.
   - ``ODOO_QUEUE_JOB_HTTP_AUTH_USER=jobrunner``, default empty.
   - ``ODOO_QUEUE_JOB_HTTP_AUTH_PASSWORD=s3cr3t``, default empty.
+  - ``ODOO_QUEUE_JOB_HTTP_POOL_SIZE=16``, number of threads (and kept-alive
+    connections) sending the ``/queue_job/runjob`` requests, default the
+    capacity of the root channel, and at least 16. A thread waits for up to
+    one second for the response of each request, so when starting jobs
+    lasting more than one second, the runner starts about ``http_pool_size``
+    of them per second, the others remaining ``enqueued`` meanwhile.
+  - ``ODOO_QUEUE_JOB_HTTP_QUEUE_SIZE=1000``, maximum number of jobs waiting
+    for a dispatcher thread before the runner blocks, default 0 (unbounded).
+  - ``ODOO_QUEUE_JOB_HTTP_BATCH_SIZE=10``, maximum number of jobs of the same
+    channel sent in one ``/queue_job/runjobs`` request, which runs them one
+    after the other, default 1 (one ``/queue_job/runjob`` request per job).
+    Each job of a batch takes one slot of the channel capacity from the time
+    the batch is sent until it is done, although it waits for the previous
+    jobs of the batch, so the channel runs fewer jobs at once than its
+    capacity. The jobs keep their order within a channel, but not across
+    channels: a batch of a channel is sent, and its jobs run one after the
+    other, while a job of higher priority of another channel may wait for
+    a free dispatcher thread. Once half of ``limit_time_real`` is elapsed,
+    the request starts no new job and sets the remaining ones back to
+    pending, so their slots are released instead of being held until the
+    ``requeue_stuck_jobs`` cron resets them.
+  - ``ODOO_QUEUE_JOB_NOTIFY_PAYLOAD=1``, have the ``queue_job_notify``
+    trigger send the job fields in its notifications, so the runner does not
+    need to read the jobs back from the table, default empty. It is applied
+    when installing or updating ``queue_job``.
+  - ``ODOO_QUEUE_JOB_DB_DISCOVERY_INTERVAL=300``, number of seconds between
+    two lookups for new or dropped databases, default 60.
+  - ``ODOO_QUEUE_JOB_RUNNER=asyncio``, run the runner on an asyncio event
+    loop (see ``async_runner``, requires ``aiohttp``), default ``default``.
+  - ``ODOO_QUEUE_JOB_EXECUTOR_WORKERS=4``, when running with ``--workers``,
+    number of job executor workers to spawn, default 0. Job executor workers
+    run the jobs directly instead of receiving ``/queue_job/runjob``
+    requests [3]_. There should be at least as many as the capacity of the
+    root channel.
+  - ``ODOO_QUEUE_JOB_EXECUTOR_SOCKET=/run/odoo/queue_job.sock``, the local
+    socket the runner uses to hand jobs to the job executor workers, default
+    ``odoo-queue_job-<http_port>.sock`` in the temporary directory.
   - ``ODOO_QUEUE_JOB_JOBRUNNER_DB_HOST=master-db``, default ``db_host``
     or ``False`` if unset.
   - ``ODOO_QUEUE_JOB_JOBRUNNER_DB_PORT=5432``, default ``db_port``
@@ -52,6 +89,14 @@ How to use it?
   port = 443
   http_auth_user = jobrunner
   http_auth_password = s3cr3t
+  http_pool_size = 16
+  http_queue_size = 1000
+  http_batch_size = 10
+  notify_payload = True
+  db_discovery_interval = 300
+  runner = asyncio
+  executor_workers = 4
+  executor_socket = /run/odoo/queue_job.sock
   jobrunner_db_host = master-db
   jobrunner_db_port = 5432
   jobrunner_db_user = userdb
@@ -112,7 +157,8 @@ Caveat
 ------
 
 * After creating a new database or installing queue_job on an
-  existing database, Odoo must be restarted for the runner to detect it.
+  existing database, the runner detects it at its next database lookup,
+  which happens every ``db_discovery_interval`` seconds.
 
 * When Odoo shuts down normally, it waits for running jobs to finish.
   However, when the Odoo server crashes or is otherwise force-stopped,
@@ -137,29 +183,43 @@ Caveat
        enqueued.
 .. [2] It works with the threaded Odoo server too, although this way
        of running Odoo is obviously not for production purposes.
+.. [3] Job executor workers are forked by the Odoo server like the HTTP
+       workers, and are subject to the same limits (``limit_time_real``,
+       ``limit_memory_soft``, ...). They avoid the cost of an HTTP request
+       for each job, which matters with many short jobs.
 """
 
 import datetime
+import json
 import logging
 import os
+import queue
 import selectors
+import socket
+import tempfile
 import threading
 import time
-from contextlib import closing, contextmanager
+from contextlib import closing, contextmanager, nullcontext
 
 import psycopg2
 import requests
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 
 import odoo
-from odoo.tools import config
+from odoo.tools import config, split_every
 
 from . import queue_job_config
 from .channels import ENQUEUED, NOT_DONE, PENDING, ChannelManager
 
 SELECT_TIMEOUT = 60
 ERROR_RECOVERY_DELAY = 5
+MAX_ERROR_RECOVERY_DELAY = 300
 PG_ADVISORY_LOCK_ID = 2293787760715711918
+DEFAULT_HTTP_POOL_SIZE = 16
+DEFAULT_DB_DISCOVERY_INTERVAL = 60
+# seconds to send the queued requests when stopping
+DISPATCHER_STOP_TIMEOUT = 10
+LOAD_BATCH_SIZE = 10000
 
 _logger = logging.getLogger(__name__)
 
@@ -211,55 +271,267 @@ def _connection_info_for(db_name):
     return connection_info
 
 
-def _async_http_get(scheme, host, port, user, password, db_name, job_uuid):
-    # Method to set failed job (due to timeout, etc) as pending,
-    # to avoid keeping it as enqueued.
-    def set_job_pending():
-        connection_info = _connection_info_for(db_name)
-        conn = psycopg2.connect(**connection_info)
-        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
-        with closing(conn.cursor()) as cr:
-            cr.execute(
-                "UPDATE queue_job SET state=%s, "
-                "date_enqueued=NULL, date_started=NULL "
-                "WHERE uuid=%s and state=%s "
-                "RETURNING uuid",
-                (PENDING, job_uuid, ENQUEUED),
+def _http_pool_size():
+    pool_size = os.environ.get("ODOO_QUEUE_JOB_HTTP_POOL_SIZE") or queue_job_config.get(
+        "http_pool_size"
+    )
+    return int(pool_size) if pool_size else None
+
+
+def _http_queue_size():
+    return int(
+        os.environ.get("ODOO_QUEUE_JOB_HTTP_QUEUE_SIZE")
+        or queue_job_config.get("http_queue_size")
+        or 0
+    )
+
+
+def _http_batch_size():
+    return int(
+        os.environ.get("ODOO_QUEUE_JOB_HTTP_BATCH_SIZE")
+        or queue_job_config.get("http_batch_size")
+        or 1
+    )
+
+
+def _db_discovery_interval():
+    return int(
+        os.environ.get("ODOO_QUEUE_JOB_DB_DISCOVERY_INTERVAL")
+        or queue_job_config.get("db_discovery_interval")
+        or DEFAULT_DB_DISCOVERY_INTERVAL
+    )
+
+
+def _executor_workers():
+    return int(
+        os.environ.get("ODOO_QUEUE_JOB_EXECUTOR_WORKERS")
+        or queue_job_config.get("executor_workers")
+        or 0
+    )
+
+
+def _executor_socket_path():
+    return (
+        os.environ.get("ODOO_QUEUE_JOB_EXECUTOR_SOCKET")
+        or queue_job_config.get("executor_socket")
+        or os.path.join(
+            tempfile.gettempdir(), f"odoo-queue_job-{config['http_port']}.sock"
+        )
+    )
+
+
+def _set_jobs_pending(db_name, job_uuids, unless_started=None):
+    # Method to set failed jobs (due to timeout, etc) as pending,
+    # to avoid keeping them as enqueued. With unless_started, nothing is
+    # done if that job has left the enqueued state, meaning that the
+    # request running the jobs is being processed.
+    connection_info = _connection_info_for(db_name)
+    conn = psycopg2.connect(**connection_info)
+    conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+    query = (
+        "UPDATE queue_job SET state=%s, "
+        "date_enqueued=NULL, date_started=NULL "
+        "WHERE uuid = ANY(%s) and state=%s "
+    )
+    args = [PENDING, list(job_uuids), ENQUEUED]
+    if unless_started:
+        query += "AND EXISTS (SELECT 1 FROM queue_job WHERE uuid=%s AND state=%s) "
+        args += [unless_started, ENQUEUED]
+    with closing(conn), closing(conn.cursor()) as cr:
+        cr.execute(query + "RETURNING uuid", args)
+        for (job_uuid,) in cr.fetchall():
+            _logger.warning(
+                "state of job %s was reset from %s to %s",
+                job_uuid,
+                ENQUEUED,
+                PENDING,
             )
-            if cr.fetchone():
-                _logger.warning(
-                    "state of job %s was reset from %s to %s",
-                    job_uuid,
-                    ENQUEUED,
-                    PENDING,
-                )
 
-    # TODO: better way to HTTP GET asynchronously (grequest, ...)?
-    #       if this was python3 I would be doing this with
-    #       asyncio, aiohttp and aiopg
-    def urlopen():
-        url = f"{scheme}://{host}:{port}/queue_job/runjob?db={db_name}&job_uuid={job_uuid}"
+
+class HttpDispatcher:
+    """Send the ``/queue_job/runjob`` requests from a fixed pool of threads.
+
+    Jobs to run are put in a queue consumed by ``pool_size`` threads, each
+    one keeping its HTTP connection to Odoo alive between requests. When
+    ``queue_size`` is set, :meth:`dispatch` blocks while the queue is full,
+    which bounds the dispatch rate of the runner.
+    """
+
+    def __init__(
+        self,
+        scheme="http",
+        host="localhost",
+        port=8069,
+        user=None,
+        password=None,
+        pool_size=DEFAULT_HTTP_POOL_SIZE,
+        queue_size=0,
+    ):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.auth = (user, password) if user else None
+        self.pool_size = max(int(pool_size), 1)
+        self.queue_size = max(int(queue_size), 0)
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._dispatched = 0
+        self._errors = 0
+
+    def start(self):
+        if self._threads:
+            return
+        for i in range(self.pool_size):
+            thread = threading.Thread(
+                target=self._work, name=f"queue_job_dispatcher_{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=DISPATCHER_STOP_TIMEOUT):
+        """Stop the threads once the queued requests are sent.
+
+        The requests not sent within ``timeout`` seconds are dropped and
+        their jobs set back to pending.
+        """
+        deadline = time.monotonic() + timeout
+        try:
+            for _thread in self._threads:
+                self._queue.put(None, timeout=max(deadline - time.monotonic(), 0))
+        except queue.Full:
+            pass
+        for thread in self._threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+        self._threads = []
+        self._drop_queued_jobs()
+
+    def _drop_queued_jobs(self):
+        uuids_by_db = {}
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item:
+                db_name, job_uuids = item
+                uuids_by_db.setdefault(db_name, []).extend(job_uuids)
+        for db_name, job_uuids in uuids_by_db.items():
+            _logger.warning(
+                "stopping, jobs %s on db %s not sent", ", ".join(job_uuids), db_name
+            )
+            self._set_jobs_pending(db_name, job_uuids)
+
+    def dispatch(self, db_name, job_uuid):
+        self._queue.put((db_name, [job_uuid]))
+
+    def dispatch_many(self, db_name, job_uuids):
+        """Ask Odoo to run several jobs of a database in one request"""
+        self._queue.put((db_name, job_uuids))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pool_size": self.pool_size,
+                "queue_size": self.queue_size,
+                "queue_depth": self._queue.qsize(),
+                "in_flight": self._in_flight,
+                "dispatched": self._dispatched,
+                "errors": self._errors,
+            }
+
+    def _url(self, db_name, job_uuids):
+        if len(job_uuids) == 1:
+            return (
+                f"{self.scheme}://{self.host}:{self.port}"
+                f"/queue_job/runjob?db={db_name}&job_uuid={job_uuids[0]}"
+            )
+        return (
+            f"{self.scheme}://{self.host}:{self.port}"
+            f"/queue_job/runjobs?db={db_name}&job_uuids={','.join(job_uuids)}"
+        )
+
+    def _open_session(self):
+        return requests.Session()
+
+    def _work(self):
+        with self._open_session() as session:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+                with self._lock:
+                    self._in_flight += 1
+                try:
+                    self._run_job(session, *item)
+                finally:
+                    with self._lock:
+                        self._in_flight -= 1
+                        self._dispatched += 1
+
+    def _run_job(self, session, db_name, job_uuids):
+        url = self._url(db_name, job_uuids)
         try:
-            auth = None
-            if user:
-                auth = (user, password)
             # we are not interested in the result, so we set a short timeout
             # but not too short so we trap and log hard configuration errors
-            response = requests.get(url, timeout=1, auth=auth)
+            response = session.get(url, timeout=1, auth=self.auth)
 
             # raise_for_status will result in either nothing, a Client Error
             # for HTTP Response codes between 400 and 500 or a Server Error
             # for codes between 500 and 600
             response.raise_for_status()
         except requests.Timeout:
-            set_job_pending()
+            # the jobs of a batch wait for the previous ones: they are
+            # expected to be still enqueued once the first job started
+            self._set_jobs_pending(db_name, job_uuids, unless_started=job_uuids[0])
         except Exception:
             _logger.exception("exception in GET %s", url)
-            set_job_pending()
+            with self._lock:
+                self._errors += 1
+            self._set_jobs_pending(db_name, job_uuids)
+
+    def _set_jobs_pending(self, db_name, job_uuids, unless_started=None):
+        try:
+            _set_jobs_pending(db_name, job_uuids, unless_started=unless_started)
+        except Exception:
+            _logger.exception(
+                "could not reset the state of jobs %s", ", ".join(job_uuids)
+            )
+
+
+class ExecutorDispatcher(HttpDispatcher):
+    """Hand the jobs to run to the job executor workers.
+
+    The job executor workers accept connections on a local socket, each
+    connection carrying the database and uuid of one job to run. Same
+    interface as :class:`HttpDispatcher`, whose queue and thread the jobs
+    go through, so the runner does not wait when all the executors are
+    busy.
+    """
+
+    def __init__(self, socket_path, pool_size=1, queue_size=0):
+        super().__init__(pool_size=pool_size, queue_size=queue_size)
+        self.socket_path = socket_path
+
+    def _open_session(self):
+        return nullcontext()
 
-    thread = threading.Thread(target=urlopen)
-    thread.daemon = True
-    thread.start()
+    def _run_job(self, session, db_name, job_uuids):
+        # there is no request overhead to amortize, jobs are handed one by one
+        for job_uuid in job_uuids:
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                    # connecting only waits when all the executors are busy
+                    # and the backlog of the socket is full
+                    sock.settimeout(1)
+                    sock.connect(self.socket_path)
+                    sock.sendall(f"{db_name} {job_uuid}\n".encode())
+            except OSError:
+                _logger.exception("could not hand job %s to an executor", job_uuid)
+                with self._lock:
+                    self._errors += 1
+                self._set_jobs_pending(db_name, [job_uuid])
 
 
 class Database:
@@ -330,16 +602,18 @@ class Database:
             cr.execute("LISTEN queue_job")
 
     @contextmanager
-    def select_jobs(self, where, args):
+    def select_jobs(self, where, args, order=None):
         # pylint: disable=sql-injection
         # the checker thinks we are injecting values but we are not, we are
         # adding the where conditions, values are added later properly with
         # parameters
         query = (
             "SELECT channel, uuid, id as seq, date_created, "
-            "priority, EXTRACT(EPOCH FROM eta), state "
+            "priority, EXTRACT(EPOCH FROM eta)::float8, state "
             f"FROM queue_job WHERE {where}"
         )
+        if order:
+            query += f" ORDER BY {order}"
         with closing(self.conn.cursor("select_jobs", withhold=True)) as cr:
             cr.execute(query, args)
             yield cr
@@ -349,18 +623,20 @@ class Database:
         with closing(self.conn.cursor()) as cr:
             cr.execute(query)
 
-    def set_job_enqueued(self, uuid):
+    def set_jobs_enqueued(self, uuids):
         with closing(self.conn.cursor()) as cr:
             cr.execute(
                 "UPDATE queue_job SET state=%s, "
                 "date_enqueued=date_trunc('seconds', "
                 "                         now() at time zone 'utc') "
-                "WHERE uuid=%s",
-                (ENQUEUED, uuid),
+                "WHERE uuid = ANY(%s)",
+                (ENQUEUED, list(uuids)),
             )
 
 
 class QueueJobRunner:
+    dispatcher_class = HttpDispatcher
+
     def __init__(
         self,
         scheme="http",
@@ -369,6 +645,11 @@ class QueueJobRunner:
         user=None,
         password=None,
         channel_config_string=None,
+        http_pool_size=None,
+        http_queue_size=0,
+        db_discovery_interval=DEFAULT_DB_DISCOVERY_INTERVAL,
+        executor_socket=None,
+        http_batch_size=1,
     ):
         self.scheme = scheme
         self.host = host
@@ -379,7 +660,29 @@ class QueueJobRunner:
         if channel_config_string is None:
             channel_config_string = _channels()
         self.channel_manager.simple_configure(channel_config_string)
+        if http_pool_size is None:
+            # enough threads to start the jobs filling the root channel at
+            # once, as each thread waits for the response of its request
+            root_capacity = self.channel_manager.get_channel_by_name("root").capacity
+            http_pool_size = max(DEFAULT_HTTP_POOL_SIZE, root_capacity or 0)
+        if executor_socket:
+            self.dispatcher = ExecutorDispatcher(executor_socket)
+        else:
+            self.dispatcher = self.dispatcher_class(
+                scheme=scheme,
+                host=host,
+                port=port,
+                user=user,
+                password=password,
+                pool_size=http_pool_size,
+                queue_size=http_queue_size,
+            )
         self.db_by_name = {}
+        self.db_discovery_interval = db_discovery_interval
+        self.http_batch_size = max(int(http_batch_size), 1)
+        self._next_discovery = 0
+        # {db_name: (next retry time, current delay)}
+        self._failed_dbs = {}
         self._stop = False
         self._stop_pipe = os.pipe()
 
@@ -415,12 +718,21 @@ class QueueJobRunner:
         password = os.environ.get(
             "ODOO_QUEUE_JOB_HTTP_AUTH_PASSWORD"
         ) or queue_job_config.get("http_auth_password")
+        executor_socket = None
+        if config["workers"] and _executor_workers():
+            # job executor workers are only spawned by the prefork server
+            executor_socket = _executor_socket_path()
         runner = cls(
             scheme=scheme or "http",
             host=host or "localhost",
             port=port or 8069,
             user=user,
             password=password,
+            http_pool_size=_http_pool_size(),
+            http_queue_size=_http_queue_size(),
+            db_discovery_interval=_db_discovery_interval(),
+            executor_socket=executor_socket,
+            http_batch_size=_http_batch_size(),
         )
         return runner
 
@@ -442,64 +754,284 @@ class QueueJobRunner:
         self.db_by_name = {}
 
     def initialize_databases(self):
+        self._failed_dbs = {}
         for db_name in sorted(self.get_db_names()):
             # sorting is important to avoid deadlocks in acquiring the master lock
-            db = Database(db_name)
-            if db.has_queue_job:
-                self.db_by_name[db_name] = db
-                with db.select_jobs("state in %s", (NOT_DONE,)) as cr:
-                    for job_data in cr:
-                        self.channel_manager.notify(db_name, *job_data)
-                _logger.info("queue job runner ready for db %s", db_name)
+            try:
+                self.attach_database(db_name)
+            except MasterElectionLost:
+                raise
+            except Exception:
+                # loading the jobs of one database must not stop the others
+                self._database_failed(db_name)
+        self._next_discovery = time.monotonic() + self.db_discovery_interval
+
+    def attach_database(self, db_name):
+        """Connect to a database and load its jobs in the channels
+
+        Return whether the database has queue_job installed.
+        """
+        db = Database(db_name)
+        if not db.has_queue_job:
+            db.close()
+            return False
+        self.db_by_name[db_name] = db
+        try:
+            self._load_jobs(db)
+        except BaseException:
+            if db_name in self.db_by_name:
+                self.detach_database(db_name)
+            raise
+        _logger.info("queue job runner ready for db %s", db_name)
+        return True
+
+    def _load_jobs(self, db):
+        # Jobs occupying channels capacity are loaded first, then pending
+        # jobs are streamed by batches, so jobs can be dispatched without
+        # waiting for the whole queue to be loaded. The pending jobs come in
+        # the order of the channels, so the first batches hold the jobs to
+        # run first.
+        not_pending = tuple(state for state in NOT_DONE if state != PENDING)
+        with db.select_jobs("state in %s", (not_pending,)) as cr:
+            while job_datas := cr.fetchmany(LOAD_BATCH_SIZE):
+                self.channel_manager.load_jobs(db.db_name, job_datas)
+        with db.select_jobs(
+            "state = %s", (PENDING,), order="priority, date_created, id"
+        ) as cr:
+            while job_datas := cr.fetchmany(LOAD_BATCH_SIZE):
+                self.channel_manager.load_jobs(db.db_name, job_datas)
+                if self._stop:
+                    break
+                self.run_jobs()
+
+    def detach_database(self, db_name):
+        """Close the connection to a database and forget its jobs"""
+        db = self.db_by_name.pop(db_name)
+        self.channel_manager.remove_db(db_name)
+        try:
+            db.close()
+        except Exception:
+            _logger.warning("error closing database %s", db_name, exc_info=True)
+        _logger.info("queue job runner detached from db %s", db_name)
+
+    def _database_failed(self, db_name):
+        """Detach a database whose connection failed and schedule its
+        reconnection, leaving the other databases running
+
+        The jobs of the database are removed from the channels so they do not
+        hold their capacity while the database is unreachable; they are loaded
+        again on reconnection.
+        """
+        _logger.exception("error on database %s, detaching it", db_name)
+        if db_name in self.db_by_name:
+            self.detach_database(db_name)
+        _retry, delay = self._failed_dbs.get(db_name, (0, 0))
+        delay = min(delay * 2, MAX_ERROR_RECOVERY_DELAY) or ERROR_RECOVERY_DELAY
+        self._failed_dbs[db_name] = (time.monotonic() + delay, delay)
+        _logger.info("reconnecting to database %s in %ds", db_name, delay)
+
+    def reconnect_databases(self):
+        """Try to reattach the failed databases whose delay has elapsed"""
+        now = time.monotonic()
+        for db_name, (retry, delay) in sorted(self._failed_dbs.items()):
+            if retry > now or self._stop:
+                continue
+            try:
+                self.attach_database(db_name)
+            except Exception:
+                _logger.warning(
+                    "could not reconnect to database %s", db_name, exc_info=True
+                )
+                delay = min(delay * 2, MAX_ERROR_RECOVERY_DELAY)
+                self._failed_dbs[db_name] = (time.monotonic() + delay, delay)
+                _logger.info("reconnecting to database %s in %ds", db_name, delay)
             else:
-                db.close()
+                del self._failed_dbs[db_name]
+
+    def discover_databases(self):
+        """Attach the new databases and detach the dropped ones
+
+        The databases already attached keep their connection and their jobs,
+        only the databases not attached yet are inspected, so databases
+        created, or on which queue_job is installed, after the runner
+        started are picked up without restarting it.
+        """
+        self._next_discovery = time.monotonic() + self.db_discovery_interval
+        db_names = set(self.get_db_names())
+        for db_name in sorted(self.db_by_name.keys() - db_names):
+            self.detach_database(db_name)
+        for db_name in self._failed_dbs.keys() - db_names:
+            # dropped while we were trying to reconnect
+            del self._failed_dbs[db_name]
+        # failed databases are reconnected by reconnect_databases
+        new_db_names = db_names - self.db_by_name.keys() - self._failed_dbs.keys()
+        for db_name in sorted(new_db_names):
+            try:
+                self.attach_database(db_name)
+            except MasterElectionLost as e:
+                _logger.debug("master election lost: %s", e)
+            except Exception:
+                _logger.warning("could not attach database %s", db_name, exc_info=True)
 
     def run_jobs(self):
         now = _odoo_now()
+        jobs = []
+        uuids_by_db = {}
         for job in self.channel_manager.get_jobs_to_run(now):
             if self._stop:
                 break
-            _logger.info("asking Odoo to run job %s on db %s", job.uuid, job.db_name)
-            self.db_by_name[job.db_name].set_job_enqueued(job.uuid)
-            _async_http_get(
-                self.scheme,
-                self.host,
-                self.port,
-                self.user,
-                self.password,
-                job.db_name,
-                job.uuid,
-            )
+            jobs.append(job)
+            uuids_by_db.setdefault(job.db_name, []).append(job.uuid)
+        # mark all the jobs of a database enqueued in one statement,
+        # before asking Odoo to run them
+        for db_name, uuids in list(uuids_by_db.items()):
+            try:
+                self.db_by_name[db_name].set_jobs_enqueued(uuids)
+            except psycopg2.Error:
+                self._database_failed(db_name)
+                del uuids_by_db[db_name]
+        jobs = [job for job in jobs if job.db_name in uuids_by_db]
+        if self.http_batch_size > 1:
+            self._dispatch_batches(jobs)
+        else:
+            # in the order of the channels
+            for job in jobs:
+                _logger.info(
+                    "asking Odoo to run job %s on db %s", job.uuid, job.db_name
+                )
+                self.dispatcher.dispatch(job.db_name, job.uuid)
+        _logger.debug("dispatcher stats: %s", self.dispatcher.stats())
+
+    def _dispatch_batches(self, jobs):
+        """Dispatch the jobs of the same channel by batches, one request
+        running them one after the other
+
+        The batches are sent channel by channel, so the order of the jobs
+        is kept within each channel only, not across channels.
+        """
+        uuids_by_channel = {}
+        for job in jobs:
+            key = (job.db_name, job.channel.fullname)
+            uuids_by_channel.setdefault(key, []).append(job.uuid)
+        for (db_name, _channel), uuids in uuids_by_channel.items():
+            for batch in split_every(self.http_batch_size, uuids):
+                _logger.info(
+                    "asking Odoo to run jobs %s on db %s", ", ".join(batch), db_name
+                )
+                self.dispatcher.dispatch_many(db_name, list(batch))
 
     def process_notifications(self):
-        for db in self.db_by_name.values():
-            if not db.conn.notifies:
-                # If there are no activity in the queue_job table it seems that
-                # tcp keepalives are not sent (in that very specific scenario),
-                # causing some intermediaries (such as haproxy) to close the
-                # connection, making the jobrunner to restart on a socket error
-                db.keep_alive()
-            while db.conn.notifies:
-                if self._stop:
-                    break
-                notification = db.conn.notifies.pop()
-                uuid = notification.payload
-                with db.select_jobs("uuid = %s", (uuid,)) as cr:
-                    job_datas = cr.fetchone()
-                    if job_datas:
-                        self.channel_manager.notify(db.db_name, *job_datas)
-                    else:
-                        self.channel_manager.remove_job(uuid)
-
-    def wait_notification(self):
+        for db in list(self.db_by_name.values()):
+            if self._stop:
+                break
+            try:
+                self._process_db_notifications(db)
+            except Exception:
+                self._database_failed(db.db_name)
+
+    def _process_db_notifications(self, db):
+        if not db.conn.notifies:
+            # If there are no activity in the queue_job table it seems that
+            # tcp keepalives are not sent (in that very specific scenario),
+            # causing some intermediaries (such as haproxy) to close the
+            # connection, making the jobrunner to restart on a socket error
+            db.keep_alive()
+        # drain the notifications received so far: a job changing state
+        # several times since the last cycle only needs to be read once
+        job_datas_by_uuid = {}
+        uuids = set()
+        for notification in db.conn.notifies:
+            uuid, job_datas = self._parse_notification(notification.payload)
+            if job_datas and not self._date_created_mismatch(uuid, job_datas):
+                job_datas_by_uuid[uuid] = job_datas
+            else:
+                uuids.add(uuid)
+        del db.conn.notifies[:]
+        for uuid, job_datas in job_datas_by_uuid.items():
+            if uuid not in uuids:
+                self.channel_manager.notify(db.db_name, *job_datas)
+        if uuids:
+            self._refresh_jobs(db, uuids)
+
+    @staticmethod
+    def _parse_notification(payload):
+        """Return the uuid and the job data carried by a notification
+
+        The job data is None when the notification carries only the uuid,
+        either because the trigger does not send the job payload, or because
+        it was too large, or because the job has been deleted.
+
+        >>> QueueJobRunner._parse_notification("abc")
+        ('abc', None)
+        >>> QueueJobRunner._parse_notification(
+        ...     '["abc", "root.a", 12, "2024-01-02T03:04:05.678", 10, null, '
+        ...     '"pending"]'
+        ... )  # doctest: +NORMALIZE_WHITESPACE
+        ('abc', ('root.a', 'abc', 12,
+                 datetime.datetime(2024, 1, 2, 3, 4, 5, 678000),
+                 10, None, 'pending'))
+
+        The trigger sends ``date_created`` with 6 fractional digits, but
+        fewer or none are accepted, as sent by the triggers of previous
+        versions (``fromisoformat`` only accepts 3 or 6 digits before
+        Python 3.11).
+
+        >>> QueueJobRunner._parse_notification(
+        ...     '["abc", "root", 1, "2024-01-02T03:04:05.5", 10, null, "done"]'
+        ... )[1][3]
+        datetime.datetime(2024, 1, 2, 3, 4, 5, 500000)
+        >>> QueueJobRunner._parse_notification(
+        ...     '["abc", "root", 1, "2024-01-02T03:04:05.12345", 10, null, "done"]'
+        ... )[1][3]
+        datetime.datetime(2024, 1, 2, 3, 4, 5, 123450)
+        """
+        if not payload.startswith("["):
+            return payload, None
+        uuid, channel, seq, date_created, priority, eta, state = json.loads(payload)
+        if "." in date_created:
+            date_format = "%Y-%m-%dT%H:%M:%S.%f"
+        else:
+            date_format = "%Y-%m-%dT%H:%M:%S"
+        date_created = datetime.datetime.strptime(date_created, date_format)
+        return uuid, (channel, uuid, seq, date_created, priority, eta, state)
+
+    def _date_created_mismatch(self, uuid, job_datas):
+        """Return whether the creation date of a notification differs from
+        the one of the known job
+
+        The job is then read from the database rather than trusting the
+        notification.
+        """
+        job = self.channel_manager.get_job(uuid)
+        if job and job.date_created != job_datas[3]:
+            _logger.warning(
+                "creation date of job %s changed from %s to %s, reading it",
+                uuid,
+                job.date_created,
+                job_datas[3],
+            )
+            return True
+        return False
+
+    def _refresh_jobs(self, db, uuids):
+        missing = set(uuids)
+        with db.select_jobs("uuid = ANY(%s)", (list(uuids),)) as cr:
+            for job_datas in cr:
+                self.channel_manager.notify(db.db_name, *job_datas)
+                missing.discard(job_datas[1])
+        # jobs that have been deleted
+        for uuid in missing:
+            self.channel_manager.remove_job(uuid)
+
+    def _get_wait_timeout(self):
+        """Return how long to wait for notifications, in seconds
+
+        Return 0 when there is no reason to wait.
+        """
         for db in self.db_by_name.values():
             if db.conn.notifies:
                 # something is going on in the queue, no need to wait
-                return
-        # wait for something to happen in the queue_job tables
-        # we'll select() on database connections and the stop pipe
-        conns = [db.conn for db in self.db_by_name.values()]
-        conns.append(self._stop_pipe[0])
+                return 0
         # look if the channels specify a wakeup time
         wakeup_time = self.channel_manager.get_wakeup_time()
         if not wakeup_time:
@@ -509,6 +1041,12 @@ class QueueJobRunner:
             timeout = SELECT_TIMEOUT
         else:
             timeout = wakeup_time - _odoo_now()
+        # wake up in time for the next database discovery
+        timeout = min(timeout, self._next_discovery - time.monotonic())
+        # and for the next reconnection of a failed database
+        if self._failed_dbs:
+            next_retry = min(retry for retry, _delay in self._failed_dbs.values())
+            timeout = min(timeout, next_retry - time.monotonic())
         # wait for a notification or a timeout;
         # if timeout is negative (ie wakeup time in the past),
         # do not wait; this should rarely happen
@@ -516,17 +1054,28 @@ class QueueJobRunner:
         # if timeout remains a large negative number, it is most
         # probably a bug
         _logger.debug("select() timeout: %.2f sec", timeout)
+        return max(timeout, 0)
+
+    def wait_notification(self):
+        timeout = self._get_wait_timeout()
+        # wait for something to happen in the queue_job tables
+        # we'll select() on database connections and the stop pipe
+        conns = [(db.conn, db.db_name) for db in self.db_by_name.values()]
+        conns.append((self._stop_pipe[0], None))
         if timeout > 0:
             if conns and not self._stop:
                 with select() as sel:
-                    for conn in conns:
-                        sel.register(conn, selectors.EVENT_READ)
+                    for conn, db_name in conns:
+                        sel.register(conn, selectors.EVENT_READ, db_name)
                     events = sel.select(timeout=timeout)
                     for key, _mask in events:
                         if key.fileobj == self._stop_pipe[0]:
                             # stop-pipe is not a conn so doesn't need poll()
                             continue
-                        key.fileobj.poll()
+                        try:
+                            key.fileobj.poll()
+                        except psycopg2.Error:
+                            self._database_failed(key.data)
 
     def stop(self):
         _logger.info("graceful stop requested")
@@ -536,16 +1085,19 @@ class QueueJobRunner:
 
     def run(self):
         _logger.info("starting")
+        self.dispatcher.start()
         while not self._stop:
             # outer loop does exception recovery
             try:
                 _logger.debug("initializing database connections")
-                # TODO: how to detect new databases or databases
-                #       on which queue_job is installed after server start?
                 self.initialize_databases()
                 _logger.info("database connections ready")
                 # inner loop does the normal processing
                 while not self._stop:
+                    if time.monotonic() >= self._next_discovery:
+                        self.discover_databases()
+                    if self._failed_dbs:
+                        self.reconnect_databases()
                     self.process_notifications()
                     self.run_jobs()
                     self.wait_notification()
@@ -569,4 +1121,5 @@ class QueueJobRunner:
                 self.close_databases()
                 time.sleep(ERROR_RECOVERY_DELAY)
         self.close_databases(remove_jobs=False)
+        self.dispatcher.stop()
         _logger.info("stopped")
@@ -24,6 +24,7 @@ from ..job import (
     WAIT_DEPENDENCIES,
     Job,
 )
+from ..post_init_hook import create_notify_trigger
 
 _logger = logging.getLogger(__name__)
 
@@ -143,6 +144,9 @@ class QueueJob(models.Model):
                 "CREATE INDEX queue_job_channel_date_done_date_created_index "
                 "ON queue_job (channel, date_done, date_created);"
             )
+        # (re)create the trigger on update too, so changing the
+        # notify_payload option is applied with -u queue_job
+        create_notify_trigger(self._cr)
 
     @api.depends("dependencies")
     def _compute_dependency_graph(self):
@@ -2,25 +2,73 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
 import logging
+import os
+
+from odoo.tools import str2bool
+
+from .jobrunner import queue_job_config
 
 logger = logging.getLogger(__name__)
 
+# pg_notify refuses payloads of 8000 bytes or more
+NOTIFY_PAYLOAD_MAX_SIZE = 8000
 
-def post_init_hook(env):
-    # this is the trigger that sends notifications when jobs change
-    logger.info("Create queue_job_notify trigger")
-    env.cr.execute(
-        """
+
+def _notify_payload_enabled():
+    return str2bool(
+        os.environ.get("ODOO_QUEUE_JOB_NOTIFY_PAYLOAD")
+        or queue_job_config.get("notify_payload")
+        or "0",
+        False,
+    )
+
+
+def create_notify_trigger(cr, payload=None):
+    """Create the trigger that sends notifications when jobs change
+
+    By default, the notification only carries the uuid of the job and the
+    job runner reads the job from the table. With ``payload``, it carries
+    the fields the runner needs to schedule the job as a JSON array
+    (see ``QueueJobRunner._parse_notification``), unless it would be too
+    large for ``pg_notify``.
+    """
+    if payload is None:
+        payload = _notify_payload_enabled()
+    if payload:
+        logger.info("Create queue_job_notify trigger with job payload")
+        notify_new = f"""
+                    payload := json_build_array(
+                        NEW.uuid,
+                        NEW.channel,
+                        NEW.id,
+                        to_char(NEW.date_created, 'YYYY-MM-DD"T"HH24:MI:SS.US'),
+                        NEW.priority,
+                        EXTRACT(EPOCH FROM NEW.eta)::float8,
+                        NEW.state
+                    )::text;
+                    IF octet_length(payload) >= {NOTIFY_PAYLOAD_MAX_SIZE} THEN
+                        payload := NEW.uuid;
+                    END IF;
+                    PERFORM pg_notify('queue_job', payload);"""
+    else:
+        logger.info("Create queue_job_notify trigger")
+        notify_new = """
+                    PERFORM pg_notify('queue_job', NEW.uuid);"""
+    # pylint: disable=sql-injection
+    # only the body of the function is formatted, there are no values
+    cr.execute(
+        f"""
             DROP TRIGGER IF EXISTS queue_job_notify ON queue_job;
             CREATE OR REPLACE
                 FUNCTION queue_job_notify() RETURNS trigger AS $$
+            DECLARE
+                payload text;
             BEGIN
                 IF TG_OP = 'DELETE' THEN
                     IF OLD.state != 'done' THEN
                         PERFORM pg_notify('queue_job', OLD.uuid);
                     END IF;
-                ELSE
-                    PERFORM pg_notify('queue_job', NEW.uuid);
+                ELSE{notify_new}
                 END IF;
                 RETURN NULL;
             END;
@@ -31,3 +79,8 @@ def post_init_hook(env):
                 FOR EACH ROW EXECUTE PROCEDURE queue_job_notify();
         """
     )
+
+
+def post_init_hook(env):
+    # this is the trigger that sends notifications when jobs change
+    create_notify_trigger(env.cr)
@@ -16,7 +16,7 @@ def post_load():
         session, dbname = _get_session_and_dbname_orig(self)
         if (
             not dbname
-            and self.httprequest.path == "/queue_job/runjob"
+            and self.httprequest.path in ("/queue_job/runjob", "/queue_job/runjobs")
             and self.httprequest.args.get("db")
         ):
             dbname = self.httprequest.args["db"]
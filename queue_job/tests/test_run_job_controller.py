@@ -0,0 +1,51 @@
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html)
+
+from unittest import mock
+
+from odoo.tests import common
+from odoo.tools import config, mute_logger
+
+from odoo.addons.queue_job.controllers import main
+from odoo.addons.queue_job.job import DONE, FAILED, PENDING, STARTED
+
+
+class TestRunJobsController(common.HttpCase):
+    def _create_job(self, failure_rate=0, enqueued=True):
+        job_ = self.env["queue.job"].with_delay()._test_job(failure_rate=failure_rate)
+        if enqueued:
+            job_.set_enqueued()
+            job_.store()
+        return job_.db_record()
+
+    def _runjobs(self, *jobs):
+        url = "/queue_job/runjobs?db={}&job_uuids={}".format(
+            self.env.cr.dbname, ",".join(job.uuid for job in jobs)
+        )
+        response = self.url_open(url)
+        self.assertEqual(response.status_code, 200)
+        self.env.invalidate_all()
+
+    def test_runjobs(self):
+        started_job = self._create_job()
+        pending_job = self._create_job(enqueued=False)
+        failing_job = self._create_job(failure_rate=1)
+        good_job = self._create_job()
+        # as if another request was running the job
+        started_job.state = STARTED
+        with mute_logger("odoo.addons.queue_job.controllers.main"):
+            self._runjobs(started_job, pending_job, failing_job, good_job)
+        self.assertEqual(started_job.state, STARTED)
+        self.assertEqual(pending_job.state, PENDING)
+        # a failing job does not prevent the next ones to run
+        self.assertEqual(failing_job.state, FAILED)
+        self.assertEqual(good_job.state, DONE)
+
+    def test_runjobs_time_limit(self):
+        jobs = [self._create_job() for __ in range(2)]
+        with (
+            mock.patch.dict(config.options, {"limit_time_real": 120}),
+            mock.patch.object(main, "RUNJOBS_TIME_LIMIT_RATIO", 0),
+        ):
+            self._runjobs(*jobs)
+        # no time left to run them, they are given back to the runner
+        self.assertEqual([job.state for job in jobs], [PENDING, PENDING])
@@ -3,11 +3,25 @@
 
 # pylint: disable=odoo-addons-relative-import
 # we are testing, we want to test as we were an external consumer of the API
+import asyncio
+import concurrent.futures
+import functools
 import os
+import socket
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from unittest import mock
+
+from werkzeug.routing import Map, Rule
 
 from odoo.tests import BaseCase, tagged
 
-from odoo.addons.queue_job.jobrunner import runner
+from odoo.addons.queue_job import jobrunner
+from odoo.addons.queue_job.controllers.main import RunJobController
+from odoo.addons.queue_job.jobrunner import async_runner, runner
 
 from .common import load_doctests
 
@@ -57,3 +71,481 @@ class TestRunner(BaseCase):
 
         self.assertFalse(self._is_open_file_descriptor(read_fd))
         self.assertFalse(self._is_open_file_descriptor(write_fd))
+
+    def test_dispatcher_pool(self):
+        dispatcher = runner.HttpDispatcher(pool_size=2, queue_size=1)
+        with mock.patch.object(runner.requests, "Session") as session_cls:
+            session = session_cls.return_value.__enter__.return_value
+            dispatcher.start()
+            for i in range(5):
+                dispatcher.dispatch("db", f"uuid-{i}")
+            dispatcher.stop()
+        # one kept-alive session per thread, not per request
+        self.assertEqual(session_cls.call_count, 2)
+        self.assertEqual(session.get.call_count, 5)
+        stats = dispatcher.stats()
+        self.assertEqual(stats["dispatched"], 5)
+        self.assertEqual(stats["errors"], 0)
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertEqual(stats["queue_depth"], 0)
+
+    def test_dispatcher_stop_timeout(self):
+        dispatcher = runner.HttpDispatcher(pool_size=1)
+        release = threading.Event()
+        with mock.patch.object(
+            runner.requests, "Session"
+        ) as session_cls, mock.patch.object(
+            dispatcher, "_set_jobs_pending"
+        ) as set_jobs_pending:
+            session = session_cls.return_value.__enter__.return_value
+            session.get.side_effect = lambda *args, **kwargs: release.wait()
+            dispatcher.start()
+            dispatcher.dispatch("db", "uuid-1")
+            dispatcher.dispatch("db", "uuid-2")
+            dispatcher.dispatch_many("db", ["uuid-3", "uuid-4"])
+            dispatcher.stop(timeout=0.1)
+            release.set()
+        # the jobs waiting behind the stuck request are not left enqueued
+        set_jobs_pending.assert_called_once_with(
+            "db", ["uuid-2", "uuid-3", "uuid-4"]
+        )
+
+    def test_dispatcher_pool_size(self):
+        # by default, enough threads to start the jobs of the root channel
+        a_runner = runner.QueueJobRunner(channel_config_string="root:40")
+        self.assertEqual(a_runner.dispatcher.pool_size, 40)
+        a_runner = runner.QueueJobRunner(channel_config_string="root:4")
+        self.assertEqual(a_runner.dispatcher.pool_size, runner.DEFAULT_HTTP_POOL_SIZE)
+        a_runner = runner.QueueJobRunner(
+            channel_config_string="root:40", http_pool_size=2
+        )
+        self.assertEqual(a_runner.dispatcher.pool_size, 2)
+
+    def test_async_dispatcher_pool(self):
+        dispatcher = async_runner.AsyncHttpDispatcher(pool_size=2)
+        running = []
+        max_running = []
+
+        class Response:
+            async def __aenter__(self):
+                running.append(self)
+                max_running.append(len(running))
+                # a job longer than the others waiting for a connection
+                await asyncio.sleep(0.01)
+                return mock.Mock()
+
+            async def __aexit__(self, *exc_info):
+                running.remove(self)
+
+        async def run():
+            with mock.patch.object(async_runner, "aiohttp", mock.Mock()):
+                dispatcher.start()
+            dispatcher._session = mock.Mock(
+                get=lambda url: Response(), close=mock.AsyncMock()
+            )
+            for i in range(10):
+                dispatcher.dispatch("db", f"uuid-{i}")
+            await dispatcher.stop()
+
+        with mock.patch.object(
+            dispatcher, "_set_jobs_pending", mock.AsyncMock()
+        ) as set_jobs_pending:
+            asyncio.run(run())
+        set_jobs_pending.assert_not_called()
+        self.assertEqual(max(max_running), 2)
+        stats = dispatcher.stats()
+        self.assertEqual(stats["dispatched"], 10)
+        self.assertEqual(stats["errors"], 0)
+
+    def test_async_run_jobs_in_db_thread(self):
+        a_runner = async_runner.AsyncQueueJobRunner(channel_config_string="root:2")
+        dispatcher = a_runner.dispatcher
+        dispatcher._run_job = mock.AsyncMock()
+        loop_thread = threading.current_thread()
+        step_threads = []
+
+        def run_jobs():
+            step_threads.append(threading.current_thread())
+            dispatcher.dispatch("db", "uuid-1")
+            dispatcher.dispatch_many("db", ["uuid-2", "uuid-3"])
+
+        async def run():
+            with mock.patch.object(async_runner, "aiohttp", mock.Mock()):
+                dispatcher.start()
+            dispatcher._session = mock.Mock(close=mock.AsyncMock())
+            a_runner._db_executor = concurrent.futures.ThreadPoolExecutor(1)
+            await a_runner._run_db_step(run_jobs)
+            a_runner._db_executor.shutdown()
+            await dispatcher.stop()
+
+        asyncio.run(run())
+        self.assertNotEqual(step_threads, [loop_thread])
+        self.assertEqual(
+            dispatcher._run_job.await_args_list,
+            [mock.call("db", ["uuid-1"]), mock.call("db", ["uuid-2", "uuid-3"])],
+        )
+
+    def test_async_wait_notification_yields(self):
+        a_runner = async_runner.AsyncQueueJobRunner(channel_config_string="root:1")
+        db = mock.Mock()
+        # pending notifications: no reason to wait
+        db.conn.notifies = [mock.Mock(payload="uuid-1")]
+        a_runner.db_by_name = {"db": db}
+        started = []
+
+        async def request():
+            started.append(True)
+
+        async def run():
+            task = asyncio.get_running_loop().create_task(request())
+            await a_runner.wait_notification_async()
+            self.assertEqual(started, [True])
+            await task
+
+        asyncio.run(run())
+
+    def test_process_notifications_coalesced(self):
+        a_runner = runner.QueueJobRunner(channel_config_string="root:1")
+        queries = []
+
+        @contextmanager
+        def select_jobs(where, args):
+            queries.append((where, args))
+            yield [("root", "uuid-1", 1, 0, 10, None, "pending")]
+
+        db = mock.Mock(db_name="db", select_jobs=select_jobs)
+        db.conn.notifies = [
+            mock.Mock(payload=uuid) for uuid in ("uuid-1", "uuid-2", "uuid-1")
+        ]
+        a_runner.db_by_name = {"db": db}
+        with mock.patch.object(a_runner.channel_manager, "remove_job") as remove:
+            a_runner.process_notifications()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(sorted(queries[0][1][0]), ["uuid-1", "uuid-2"])
+        self.assertFalse(db.conn.notifies)
+        self.assertIn("uuid-1", a_runner.channel_manager._jobs_by_uuid)
+        remove.assert_called_once_with("uuid-2")
+
+    def test_process_notifications_payload(self):
+        a_runner = runner.QueueJobRunner(channel_config_string="root:1")
+        queries = []
+
+        @contextmanager
+        def select_jobs(where, args):
+            queries.append((where, args))
+            yield []
+
+        db = mock.Mock(db_name="db", select_jobs=select_jobs)
+        db.conn.notifies = [
+            mock.Mock(
+                payload='["uuid-1", "root", 1, "2024-01-02T03:04:05", 10, null, '
+                '"enqueued"]'
+            ),
+            mock.Mock(
+                payload='["uuid-1", "root", 1, "2024-01-02T03:04:05", 10, null, '
+                '"pending"]'
+            ),
+        ]
+        a_runner.db_by_name = {"db": db}
+        a_runner.process_notifications()
+        # the payload is enough, no need to read the job
+        self.assertFalse(queries)
+        job = a_runner.channel_manager._jobs_by_uuid["uuid-1"]
+        self.assertEqual(job.date_created, datetime(2024, 1, 2, 3, 4, 5))
+        self.assertEqual(
+            [j.uuid for j in a_runner.channel_manager.get_jobs_to_run(0)],
+            ["uuid-1"],
+        )
+
+    def test_process_notifications_date_created_mismatch(self):
+        a_runner = runner.QueueJobRunner(channel_config_string="root:1")
+        loaded = datetime(2024, 1, 2, 3, 4, 5, 678901)
+        a_runner.channel_manager.notify(
+            "db", "root", "uuid-1", 1, loaded, 10, None, "pending"
+        )
+        queries = []
+
+        @contextmanager
+        def select_jobs(where, args):
+            queries.append((where, args))
+            yield [("root", "uuid-1", 1, loaded, 10, None, "enqueued")]
+
+        db = mock.Mock(db_name="db", select_jobs=select_jobs)
+        db.conn.notifies = [
+            mock.Mock(
+                payload='["uuid-1", "root", 1, "2024-01-02T03:04:05.678", 10, '
+                'null, "enqueued"]'
+            ),
+        ]
+        a_runner.db_by_name = {"db": db}
+        a_runner.process_notifications()
+        # the job is read from the database instead of trusting the payload
+        self.assertEqual(queries, [("uuid = ANY(%s)", (["uuid-1"],))])
+        job = a_runner.channel_manager.get_job("uuid-1")
+        self.assertEqual(job.date_created, loaded)
+        self.assertFalse(list(a_runner.channel_manager.get_jobs_to_run(0)))
+
+    def test_database_failed_any_error(self):
+        a_runner = runner.QueueJobRunner(channel_config_string="root:1")
+        failing, healthy = mock.Mock(db_name="failing"), mock.Mock(db_name="healthy")
+        failing.conn.notifies = [mock.Mock(payload='["uuid-1", "truncated')]
+        healthy.conn.notifies = [mock.Mock(payload="uuid-2")]
+        a_runner.db_by_name = {"failing": failing, "healthy": healthy}
+        with mock.patch.object(a_runner, "_refresh_jobs") as refresh_jobs:
+            a_runner.process_notifications()
+        # not a database error, but only its database is detached
+        refresh_jobs.assert_called_once_with(healthy, {"uuid-2"})
+        self.assertEqual(list(a_runner.db_by_name), ["healthy"])
+        self.assertIn("failing", a_runner._failed_dbs)
+
+        def attach_database(db_name):
+            if db_name == "failing":
+                raise ValueError("corrupted job")
+            return True
+
+        with mock.patch.object(
+            a_runner, "get_db_names", return_value=["failing", "healthy"]
+        ), mock.patch.object(
+            a_runner, "attach_database", side_effect=attach_database
+        ) as attach:
+            a_runner.initialize_databases()
+        self.assertEqual(attach.call_count, 2)
+        self.assertEqual(list(a_runner._failed_dbs), ["failing"])
+
+        with mock.patch.object(
+            a_runner, "get_db_names", return_value=["failing", "healthy"]
+        ), mock.patch.object(
+            a_runner, "attach_database", side_effect=runner.MasterElectionLost()
+        ), self.assertRaises(runner.MasterElectionLost):
+            # another runner is the master: not a failure of the database
+            a_runner.initialize_databases()
+
+    def test_discover_databases(self):
+        a_runner = runner.QueueJobRunner(channel_config_string="root:1")
+        kept, dropped = mock.Mock(), mock.Mock()
+        a_runner.db_by_name = {"kept": kept, "dropped": dropped}
+        with mock.patch.object(
+            a_runner, "get_db_names", return_value=["kept", "new"]
+        ), mock.patch.object(a_runner, "attach_database") as attach:
+            a_runner.discover_databases()
+        attach.assert_called_once_with("new")
+        dropped.close.assert_called_once_with()
+        kept.close.assert_not_called()
+        self.assertEqual(list(a_runner.db_by_name), ["kept"])
+
+    def test_database_failed(self):
+        a_runner = runner.QueueJobRunner(channel_config_string="root:1")
+        failing, healthy = mock.Mock(db_name="failing"), mock.Mock(db_name="healthy")
+        failing.keep_alive.side_effect = runner.psycopg2.OperationalError()
+        healthy.conn.notifies = []
+        failing.conn.notifies = []
+        a_runner.db_by_name = {"failing": failing, "healthy": healthy}
+        a_runner.process_notifications()
+        # only the failing database is detached, with a delay to reconnect
+        self.assertEqual(list(a_runner.db_by_name), ["healthy"])
+        healthy.close.assert_not_called()
+        self.assertEqual(
+            a_runner._failed_dbs["failing"][1], runner.ERROR_RECOVERY_DELAY
+        )
+        with mock.patch.object(
+            a_runner, "attach_database", side_effect=runner.psycopg2.OperationalError
+        ) as attach:
+            # not yet
+            a_runner.reconnect_databases()
+            attach.assert_not_called()
+            a_runner._failed_dbs["failing"] = (0, runner.ERROR_RECOVERY_DELAY)
+            a_runner.reconnect_databases()
+            attach.assert_called_once_with("failing")
+        # backoff
+        self.assertEqual(
+            a_runner._failed_dbs["failing"][1], runner.ERROR_RECOVERY_DELAY * 2
+        )
+        with mock.patch.object(a_runner, "attach_database") as attach:
+            a_runner._failed_dbs["failing"] = (0, runner.ERROR_RECOVERY_DELAY)
+            a_runner.reconnect_databases()
+            attach.assert_called_once_with("failing")
+        self.assertFalse(a_runner._failed_dbs)
+
+    def test_load_jobs_streaming(self):
+        a_runner = runner.QueueJobRunner(channel_config_string="root:1")
+        rows = {
+            "started": [("root", "uuid-s", 1, 0, 10, None, "started")],
+            "pending": [("root", "uuid-p", 2, 0, 10, None, "pending")],
+        }
+        cursors = []
+
+        @contextmanager
+        def select_jobs(where, args, order=None):
+            state = "pending" if where == "state = %s" else "started"
+            cr = mock.Mock()
+            cr.fetchmany.side_effect = [rows[state], []]
+            cursors.append((state, order))
+            yield cr
+
+        db = mock.Mock(db_name="db", select_jobs=select_jobs)
+        a_runner.db_by_name = {"db": db}
+        with mock.patch.object(a_runner, "run_jobs") as run_jobs:
+            a_runner._load_jobs(db)
+        # running jobs are known before pending jobs are dispatched
+        # and pending jobs come in the order they are run
+        self.assertEqual(
+            cursors,
+            [("started", None), ("pending", "priority, date_created, id")],
+        )
+        run_jobs.assert_called_once_with()
+        # the root channel is full with the started job
+        self.assertFalse(list(a_runner.channel_manager.get_jobs_to_run(0)))
+
+    def test_runner_class(self):
+        with mock.patch.dict(os.environ, {"ODOO_QUEUE_JOB_RUNNER": "default"}):
+            self.assertIs(jobrunner._runner_class(), runner.QueueJobRunner)
+        with mock.patch.dict(os.environ, {"ODOO_QUEUE_JOB_RUNNER": "asyncio"}):
+            with mock.patch.object(async_runner, "aiohttp", None):
+                # missing library, fallback on the default runner
+                self.assertIs(jobrunner._runner_class(), runner.QueueJobRunner)
+            with mock.patch.object(async_runner, "aiohttp", mock.Mock()):
+                self.assertIs(
+                    jobrunner._runner_class(), async_runner.AsyncQueueJobRunner
+                )
+
+    def test_executor_dispatcher(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "executor.sock")
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+                listener.bind(path)
+                listener.listen()
+                a_runner = runner.QueueJobRunner(
+                    channel_config_string="root:1", executor_socket=path
+                )
+                a_runner.dispatcher.start()
+                # handed from the dispatcher thread, not from the runner
+                a_runner.dispatcher.dispatch("db", "uuid-1")
+                client, _addr = listener.accept()
+                with client:
+                    self.assertEqual(client.recv(1024), b"db uuid-1\n")
+                a_runner.dispatcher.stop()
+        self.assertEqual(a_runner.dispatcher.stats()["dispatched"], 1)
+        self.assertEqual(a_runner.dispatcher.stats()["errors"], 0)
+
+    @contextmanager
+    def _executor_worker(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "executor.sock")
+            with mock.patch.object(
+                jobrunner, "_executor_socket_path", return_value=path
+            ):
+                listener = jobrunner._create_executor_socket()
+            with listener:
+                listener.setblocking(False)
+                multi = mock.Mock(queue_job_executor_socket=listener)
+                multi.pipe_new.return_value = (None, None)
+                yield jobrunner.WorkerJobExecutor(multi), path
+
+    def _send_to_executor(self, path, message):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(path)
+            client.sendall(message)
+
+    def test_executor_socket_private(self):
+        umask = os.umask(0o022)
+        try:
+            with self._executor_worker() as (_worker, path):
+                mode = stat.S_IMODE(os.stat(path).st_mode)
+            self.assertEqual(os.umask(0o022), 0o022)
+        finally:
+            os.umask(umask)
+        self.assertEqual(mode, 0o600)
+
+    def test_executor_process_work(self):
+        with (
+            self._executor_worker() as (worker, path),
+            mock.patch.object(jobrunner, "Registry") as registry,
+            mock.patch.object(jobrunner, "api") as api,
+            mock.patch.object(jobrunner, "_get_run_job_controller") as controller,
+        ):
+            self._send_to_executor(path, b"db uuid-1\n")
+            worker.process_work()
+        registry.assert_called_once_with("db")
+        env = api.Environment.return_value
+        controller.assert_called_once_with(env)
+        controller.return_value._runjob.assert_called_once_with(env, "uuid-1")
+        self.assertEqual(worker.request_count, 1)
+
+    def test_executor_run_job_controller(self):
+        controller = RunJobController()
+        routing_map = Map(
+            [Rule("/queue_job/runjob", endpoint=functools.partial(controller.runjob))]
+        )
+        env = {"ir.http": mock.Mock(routing_map=lambda: routing_map)}
+        self.assertIs(jobrunner._get_run_job_controller(env), controller)
+
+    def test_executor_dispatcher_busy(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            a_runner = runner.QueueJobRunner(
+                channel_config_string="root:1",
+                executor_socket=os.path.join(tmpdir, "missing.sock"),
+            )
+            dispatcher = a_runner.dispatcher
+            with mock.patch.object(dispatcher, "_set_jobs_pending") as set_pending:
+                dispatcher.start()
+                dispatcher.dispatch_many("db", ["uuid-1", "uuid-2"])
+                dispatcher.stop()
+        self.assertEqual(
+            set_pending.call_args_list,
+            [mock.call("db", ["uuid-1"]), mock.call("db", ["uuid-2"])],
+        )
+        self.assertEqual(dispatcher.stats()["errors"], 2)
+
+    def test_executor_process_work_invalid(self):
+        with (
+            self._executor_worker() as (worker, path),
+            mock.patch.object(jobrunner.WorkerJobExecutor, "run_job") as run_job,
+        ):
+            self._send_to_executor(path, b"garbage\n")
+            with self.assertLogs(jobrunner._logger, "ERROR"):
+                worker.process_work()
+            # nothing to accept: no error
+            worker.process_work()
+        run_job.assert_not_called()
+        self.assertEqual(worker.request_count, 0)
+
+    def test_run_jobs_order(self):
+        a_runner = runner.QueueJobRunner(channel_config_string="root:5,A:3,B:3")
+        for seq, (channel, priority) in enumerate([("A", 1), ("B", 5), ("A", 10)]):
+            a_runner.channel_manager.notify(
+                "db", channel, f"uuid-{seq}", seq, 0, priority, None, "pending"
+            )
+        a_runner.db_by_name = {"db": mock.Mock()}
+        a_runner.dispatcher = mock.Mock()
+        a_runner.run_jobs()
+        # without batches, the jobs are dispatched by priority, not by channel
+        self.assertEqual(
+            a_runner.dispatcher.dispatch.call_args_list,
+            [
+                mock.call("db", "uuid-0"),
+                mock.call("db", "uuid-1"),
+                mock.call("db", "uuid-2"),
+            ],
+        )
+
+    def test_run_jobs_batch(self):
+        a_runner = runner.QueueJobRunner(
+            channel_config_string="root:5,A:3", http_batch_size=2
+        )
+        for seq, channel in enumerate(["A", "A", "A", "root"]):
+            a_runner.channel_manager.notify(
+                "db", channel, f"uuid-{seq}", seq, 0, 10, None, "pending"
+            )
+        db = mock.Mock()
+        a_runner.db_by_name = {"db": db}
+        a_runner.dispatcher = mock.Mock()
+        a_runner.run_jobs()
+        db.set_jobs_enqueued.assert_called_once()
+        self.assertEqual(
+            a_runner.dispatcher.dispatch_many.call_args_list,
+            [
+                mock.call("db", ["uuid-0", "uuid-1"]),
+                mock.call("db", ["uuid-2"]),
+                mock.call("db", ["uuid-3"]),
+            ],
+        )